@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -101,6 +103,26 @@ DATABASES = {
     }
 }
 
+# Extra databases holding carts only, e.g.
+# CART_SHARD_DATABASES=postgres://host1/carts,postgres://host2/carts
+for index, url in enumerate(env.list('CART_SHARD_DATABASES', default=[]), start=1):
+    DATABASES[f'carts_{index}'] = env.db_url_config(url)
+
+DATABASE_ROUTERS = ['store.routers.CartShardRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    # Per-process cache for short-lived, frequently read objects
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'local',
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -149,7 +171,7 @@ AUTH_USER_MODEL = 'core.User'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -158,8 +180,130 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Above this many rows paginators report Postgres planner estimates
+# instead of running an exact COUNT(*).
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+# Carts without activity for this long are removed by purge_carts
+CART_TTL = timedelta(days=30)
+
+# Database aliases carts are spread over by a consistent hash of their id.
+# Run rebalance_carts after changing this list.
+CART_SHARDS = env.list('CART_SHARDS', default=list(DATABASES))
+
+CART_STORAGE = {
+    # 'store.cart_storage.CacheCartStorage' keeps carts in the cache and
+    # writes them behind to the database every FLUSH_INTERVAL seconds.
+    'BACKEND': env(
+        'CART_STORAGE_BACKEND',
+        default='store.cart_storage.DatabaseCartStorage'
+    ),
+    'CACHE_ALIAS': 'default',
+    'FLUSH_INTERVAL': 2,
+    'LOCK_TIMEOUT': 5,
+}
+
+COMMENT_FEED_CACHE_TIMEOUT = 5 * 60
+PRODUCT_ID_CACHE_TIMEOUT = 60 * 60
+PRODUCT_FACETS_CACHE_TIMEOUT = 10 * 60
+PRODUCT_CACHE_TIMEOUT = 10 * 60
+# Rendered catalog responses, stored already compressed per encoding
+CATALOG_RESPONSE_CACHE_TIMEOUT = 5 * 60
+PRODUCT_BATCH_MAX_SIZE = 100
+
+# Token bucket limits per client: RATE is the sustained rate and BURST the
+# requests allowed at once. Views can override a scope's limits with a
+# `throttle_limits` attribute.
+THROTTLING = {
+    'CACHE_ALIAS': 'default',
+    'LIMITS': {
+        # Product searches and listing pages past the first
+        'search': {'RATE': '60/min', 'BURST': 20},
+        'checkout': {'RATE': '10/min', 'BURST': 5},
+        # Token creation and sign-up
+        'auth': {'RATE': '5/min', 'BURST': 5},
+    },
+}
+
+IDEMPOTENCY = {
+    'CACHE_ALIAS': 'default',
+    # Responses are replayed for retries within this window
+    'TTL': timedelta(hours=24),
+    # Longest a duplicate waits for the first request to finish
+    'LOCK_TIMEOUT': 30,
+}
+
+BATCH = {
+    'MAX_REQUESTS': 20,
+    # Reads running at once, each on its own worker thread and connection
+    'MAX_CONCURRENCY': 4,
+}
+
+POPULARITY = {
+    # Activity loses half its weight every HALF_LIFE_DAYS; older than
+    # WINDOW_DAYS it is ignored.
+    'HALF_LIFE_DAYS': 14,
+    'WINDOW_DAYS': 90,
+    'ORDER_WEIGHT': 1.0,
+    'CART_WEIGHT': 0.25,
+    'TOP_PRODUCTS_LIMIT': 10,
+    'TOP_PRODUCTS_CACHE_ALIAS': 'local',
+    'TOP_PRODUCTS_CACHE_TIMEOUT': 5 * 60,
+}
+
+RECOMMENDATIONS = {
+    # Orders folded into the co-purchase counts per transaction
+    'CHUNK_SIZE': 5000,
+    'TOP_K': 10,
+    # Orders younger than this wait for the next run
+    'SETTLE_SECONDS': 60,
+}
+
+# Rows fetched per round trip by the streaming product export
+PRODUCT_EXPORT_CHUNK_SIZE = 2000
+
+# Rows upserted per transaction by import_products and the import endpoint
+PRODUCT_IMPORT_BATCH_SIZE = 1000
+
+# Upper bounds of the price histogram buckets in product facets; prices
+# above the last bound fall into an open-ended bucket.
+PRODUCT_PRICE_FACET_BOUNDS = [10, 25, 50, 100, 250, 500]
+
+COMMENT_INGESTION = {
+    # 'sync' inserts every comment in its request, 'buffered' accepts it
+    # and bulk inserts buffered comments every MAX_ITEMS or MAX_DELAY_MS.
+    'MODE': env('COMMENT_INGESTION_MODE', default='sync'),
+    'MAX_ITEMS': 100,
+    'MAX_DELAY_MS': 500,
+    'SPOOL_DIRECTORY': env(
+        'COMMENT_INGESTION_SPOOL_DIRECTORY',
+        default=str(BASE_DIR / 'spool')
+    ),
+}
+
+AUTH_USER_CACHE_ALIAS = 'local'
+AUTH_USER_CACHE_TIMEOUT = 30
+
 DJOSER = {
     'SERIALIZERS': {
         # 'user_create': 'core.serializers.UserCreateSerializer',
     },
 }
+
+PROFILER = {
+    'DIRECTORY': env('PROFILER_DIRECTORY', default=str(BASE_DIR / 'profiles')),
+    'INTERVAL': 0.005,
+    'MAX_AGE': timedelta(days=7).total_seconds(),
+    'MAX_FILES': 200,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'TOKEN_MAX_AGE': timedelta(hours=1).total_seconds(),
+    'HEADER': 'X-Profile-Token',
+    'QUERY_PARAM': 'profile',
+}
+
+# Responses smaller than MIN_SIZE bytes are sent uncompressed. brotli and
+# zstd are offered when the brotli and zstandard packages are installed.
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'LEVELS': {'zstd': 3, 'br': 5, 'gzip': 6},
+}
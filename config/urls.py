@@ -16,6 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from djoser.views import UserViewSet
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from core.throttling import AuthThrottle
 
 admin.site.site_header = 'Ecommerce Admin Panel'
 admin.site.index_title = 'Admin Panel'
@@ -23,6 +27,20 @@ admin.site.index_title = 'Admin Panel'
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('__debug__/', include('debug_toolbar.urls')),
+    # Throttled copies of the djoser routes that take credentials or create users
+    path(
+        'auth/users/',
+        UserViewSet.as_view(
+            {'get': 'list', 'post': 'create'},
+            throttle_classes=[AuthThrottle]
+        ),
+        name='user-list'
+    ),
+    path(
+        'auth/jwt/create/',
+        TokenObtainPairView.as_view(throttle_classes=[AuthThrottle]),
+        name='jwt-create'
+    ),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
     path('store/', include('store.urls', namespace='store')),
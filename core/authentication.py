@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CACHE_KEY = 'auth:user:{}'
+
+
+def get_user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def invalidate_cached_user(user_id):
+    get_user_cache().delete(USER_CACHE_KEY.format(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        cache = get_user_cache()
+        cache_key = USER_CACHE_KEY.format(user_id)
+        user = cache.get(cache_key)
+
+        if user is None:
+            user = self.user_model.objects.select_related('customer') \
+                .filter(**{api_settings.USER_ID_FIELD: user_id}) \
+                .first()
+            if user is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+            try:
+                user.customer_pk = user.customer.pk
+            except ObjectDoesNotExist:
+                user.customer_pk = None
+
+            cache.set(cache_key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."),
+                    code='password_changed'
+                )
+
+        return user
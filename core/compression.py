@@ -0,0 +1,94 @@
+import time
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def get_compression_settings():
+    return settings.COMPRESSION
+
+
+def get_available_encodings():
+    # In order of preference when the client accepts several equally.
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate_encoding(accept_encoding):
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    encodings = [
+        encoding for encoding in get_available_encodings()
+        if weights.get(encoding, weights.get('*', 0)) > 0
+    ]
+    if not encodings:
+        return None
+    return max(encodings, key=lambda encoding: weights.get(encoding, weights.get('*')))
+
+
+def get_compressor(encoding):
+    level = get_compression_settings()['LEVELS'][encoding]
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def compress(content, encoding):
+    # Returns the compressed content and the CPU seconds it took.
+    started = time.thread_time()
+    compress_chunk, finish = get_compressor(encoding)
+    compressed = compress_chunk(content) + finish()
+    return compressed, time.thread_time() - started
+
+
+def iter_compressed(chunks, encoding):
+    compress_chunk, finish = get_compressor(encoding)
+    for chunk in chunks:
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def add_server_timing(response, metric):
+    if response.has_header('Server-Timing'):
+        metric = f'{response["Server-Timing"]}, {metric}'
+    response['Server-Timing'] = metric
+
+
+def set_compression_headers(response, encoding, original_size, compressed_size, cpu_seconds):
+    response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(compressed_size)
+    response['X-Compression-Ratio'] = f'{original_size / max(compressed_size, 1):.2f}'
+    add_server_timing(response, f'compress;dur={cpu_seconds * 1000:.3f}')
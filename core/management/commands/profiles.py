@@ -0,0 +1,74 @@
+from pathlib import Path
+import json
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import ProfileStorage, create_token
+
+
+class Command(BaseCommand):
+    help = 'Lists, fetches and issues tokens for captured request profiles'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        subparsers.add_parser('list', help='List captured profiles')
+
+        fetch_parser = subparsers.add_parser('fetch', help='Fetch a profile')
+        fetch_parser.add_argument('profile_id')
+        fetch_parser.add_argument(
+            '--output',
+            help='Directory to copy the profile files to'
+        )
+        fetch_parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Print the SQL timeline instead of the collapsed stacks'
+        )
+
+        token_parser = subparsers.add_parser(
+            'token',
+            help='Issue a signed token for the profiling header'
+        )
+        token_parser.add_argument('--label', default='profile')
+
+    def handle(self, *args, **options):
+        storage = ProfileStorage.from_settings()
+        action = options['action']
+
+        if action == 'list':
+            self.list_profiles(storage)
+        elif action == 'fetch':
+            self.fetch_profile(storage, **options)
+        elif action == 'token':
+            self.stdout.write(create_token(options['label']))
+
+    def list_profiles(self, storage):
+        storage.enforce_limits()
+        for meta in storage.list():
+            self.stdout.write(
+                f'{meta["id"]}  {meta["status"]}  '
+                f'{meta["duration_ms"]:>10.1f}ms  '
+                f'{len(meta["queries"]):>4} queries  '
+                f'{meta["method"]} {meta["path"]}'
+            )
+
+    def fetch_profile(self, storage, profile_id, output, sql, **options):
+        meta = storage.load(profile_id)
+        if meta is None:
+            raise CommandError(f'Profile "{profile_id}" does not exist.')
+
+        if output:
+            output_dir = Path(output)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copy(storage.collapsed_path(profile_id), output_dir)
+            shutil.copy(storage.meta_path(profile_id), output_dir)
+            self.stdout.write(f'Profile {profile_id} copied to {output_dir}')
+        elif sql:
+            self.stdout.write(json.dumps(meta['queries'], indent=2))
+        else:
+            self.stdout.write(
+                storage.collapsed_path(profile_id).read_text(),
+                ending=''
+            )
@@ -0,0 +1,109 @@
+import re
+import time
+
+from django.utils.cache import patch_vary_headers
+
+from core import compression
+from core.profiling import (
+    ProfileStorage,
+    QueryTimeline,
+    SamplingProfiler,
+    get_profiler_settings,
+    is_valid_token,
+)
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler_settings = get_profiler_settings()
+        if not self.should_profile(request, profiler_settings):
+            return self.get_response(request)
+
+        storage = ProfileStorage.from_settings()
+        profile_id = storage.new_id()
+        started = time.perf_counter()
+        profiler = SamplingProfiler(interval=profiler_settings['INTERVAL'])
+        timeline = QueryTimeline(started)
+
+        profiler.start()
+        try:
+            with timeline.install():
+                response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        storage.save(
+            profile_id,
+            collapsed=profiler.collapsed(),
+            meta={
+                'id': profile_id,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'duration_ms': duration_ms,
+                'samples': sum(profiler.samples.values()),
+                'interval': profiler_settings['INTERVAL'],
+                'queries': timeline.queries,
+            }
+        )
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def should_profile(self, request, profiler_settings):
+        token = request.headers.get(profiler_settings['HEADER'])
+        if token:
+            return is_valid_token(token, profiler_settings['TOKEN_MAX_AGE'])
+
+        # JWT users are only authenticated inside the views, so the query
+        # flag is honoured for session users (e.g. staff logged into admin).
+        user = getattr(request, 'user', None)
+        return bool(
+            profiler_settings['QUERY_PARAM'] in request.GET
+            and user is not None
+            and user.is_staff
+        )
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < \
+                compression.get_compression_settings()['MIN_SIZE']:
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = compression.negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+
+        if response.streaming:
+            # Chunks are compressed as they are produced; the size is unknown.
+            response.streaming_content = compression.iter_compressed(
+                response.streaming_content,
+                encoding
+            )
+            response['Content-Encoding'] = encoding
+            del response['Content-Length']
+            return response
+
+        compressed, cpu_seconds = compression.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        original_size = len(response.content)
+        response.content = compressed
+        compression.set_compression_headers(
+            response, encoding, original_size, len(compressed), cpu_seconds
+        )
+        return response
@@ -0,0 +1,175 @@
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+import json
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+PROFILER_SALT = 'core.profiling'
+
+
+def get_profiler_settings():
+    # The defaults live in settings.PROFILER.
+    return {
+        **settings.PROFILER,
+        'DIRECTORY': Path(settings.PROFILER['DIRECTORY']),
+    }
+
+
+def create_token(label='profile'):
+    return signing.TimestampSigner(salt=PROFILER_SALT).sign(label)
+
+
+def is_valid_token(token, max_age):
+    try:
+        signing.TimestampSigner(salt=PROFILER_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class SamplingProfiler:
+    def __init__(self, interval, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({code.co_filename}:{frame.f_lineno})'
+                )
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in self.samples.most_common()
+        )
+
+
+class QueryTimeline:
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append({
+                'database': context['connection'].alias,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round((end - start) * 1000, 3),
+                'sql': sql,
+                'many': many,
+            })
+
+    def install(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class ProfileStorage:
+    def __init__(self, directory, max_age, max_files, max_bytes):
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls):
+        profiler_settings = get_profiler_settings()
+        return cls(
+            directory=profiler_settings['DIRECTORY'],
+            max_age=profiler_settings['MAX_AGE'],
+            max_files=profiler_settings['MAX_FILES'],
+            max_bytes=profiler_settings['MAX_BYTES'],
+        )
+
+    def new_id(self):
+        return f'{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+
+    def collapsed_path(self, profile_id):
+        return self.directory / f'{profile_id}.folded'
+
+    def meta_path(self, profile_id):
+        return self.directory / f'{profile_id}.json'
+
+    def save(self, profile_id, collapsed, meta):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.collapsed_path(profile_id).write_text(collapsed)
+        self.meta_path(profile_id).write_text(json.dumps(meta, indent=2))
+        self.enforce_limits()
+
+    def load(self, profile_id):
+        meta_path = self.meta_path(profile_id)
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text())
+
+    def list(self):
+        if not self.directory.exists():
+            return []
+        return sorted(
+            (
+                json.loads(path.read_text())
+                for path in self.directory.glob('*.json')
+            ),
+            key=lambda meta: meta['id']
+        )
+
+    def delete(self, profile_id):
+        self.collapsed_path(profile_id).unlink(missing_ok=True)
+        self.meta_path(profile_id).unlink(missing_ok=True)
+
+    def enforce_limits(self):
+        if not self.directory.exists():
+            return
+
+        profiles = []
+        for meta_path in self.directory.glob('*.json'):
+            profile_id = meta_path.stem
+            paths = [meta_path, self.collapsed_path(profile_id)]
+            size = sum(path.stat().st_size for path in paths if path.exists())
+            profiles.append((meta_path.stat().st_mtime, profile_id, size))
+        profiles.sort(reverse=True)
+
+        now = time.time()
+        total_bytes = 0
+        for index, (modified_at, profile_id, size) in enumerate(profiles):
+            total_bytes += size
+            if (
+                index >= self.max_files
+                or total_bytes > self.max_bytes
+                or now - modified_at > self.max_age
+            ):
+                self.delete(profile_id)
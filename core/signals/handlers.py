@@ -1,8 +1,22 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from core.authentication import invalidate_cached_user
+from store.models import Customer
 from store.signals import order_created
 
 
 @receiver(order_created)
 def send_email_to_customer(sender, **kwargs):
     print(f'SENDING EMAIL TO CUSTOMER FOR NEW ORDER: {kwargs["order"].pk}')
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
@@ -0,0 +1,102 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_KEY = 'throttle:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def get_throttle_cache():
+    return caches[settings.THROTTLING['CACHE_ALIAS']]
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    # A token bucket kept as one timestamp per client (the generic cell rate
+    # algorithm): the time the bucket will be full again. Views override the
+    # configured limits of a scope with a `throttle_limits` attribute.
+    scope = None
+    # Longest a request waits for another one to update the same bucket;
+    # past it the request is let through rather than queued.
+    lock_wait = 0.05
+
+    def applies(self, request, view):
+        return True
+
+    def get_limits(self, view):
+        limits = {
+            **settings.THROTTLING['LIMITS'][self.scope],
+            **getattr(view, 'throttle_limits', {}).get(self.scope, {}),
+        }
+        count, period = parse_rate(limits['RATE'])
+        return period / count, limits['BURST']
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return THROTTLE_KEY.format(self.scope, ident)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not self.applies(request, view):
+            return True
+
+        interval, burst = self.get_limits(view)
+        cache = get_throttle_cache()
+        key = self.get_cache_key(request)
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not cache.add(lock_key, True, 1):
+            if time.monotonic() > deadline:
+                return True
+            time.sleep(0.002)
+
+        try:
+            now = time.time()
+            full_at = max(cache.get(key, now), now)
+            # Each request takes one token; the bucket holds `burst` of them.
+            allowed_at = full_at - interval * (burst - 1)
+            if now < allowed_at:
+                self.wait_seconds = allowed_at - now
+                return False
+            full_at += interval
+            cache.set(key, full_at, math.ceil(full_at - now) + 1)
+            return True
+        finally:
+            cache.delete(lock_key)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SearchThrottle(TokenBucketThrottle):
+    scope = 'search'
+
+    def applies(self, request, view):
+        # The first page of a plain listing is cheap and usually cached.
+        return bool(request.query_params.get('search')) \
+            or request.query_params.get('page', '1') != '1'
+
+
+class CheckoutThrottle(TokenBucketThrottle):
+    scope = 'checkout'
+
+    def applies(self, request, view):
+        return request.method == 'POST'
+
+
+class AuthThrottle(TokenBucketThrottle):
+    scope = 'auth'
+
+    def applies(self, request, view):
+        return request.method not in SAFE_METHODS
@@ -1,10 +1,23 @@
+from collections import Counter
+
 from django.contrib import admin
-from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.http import QueryDict
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.http import urlencode
 
+from . import cache
+from . import counters
 from . import models
+from . import recommendations
+from . import rollups
+from .cart_storage import attach_products
+from .paginations import EstimatedCountPaginator
+from .sharding import get_cart_shard, get_cart_shards
 
 
 def pluralize_objects(objects_count):
@@ -13,6 +26,61 @@ def pluralize_objects(objects_count):
     return 's were'
 
 
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    selected_object = None
+
+    def optgroups(self, name, value, attr=None):
+        selected_choices = {str(v) for v in value if v not in (None, '')}
+        if (
+            self.selected_object is None
+            or selected_choices != {str(self.selected_object.pk)}
+        ):
+            return super().optgroups(name, value, attr)
+
+        # Render the selected option from the inline's already loaded
+        # object instead of querying it again for every row.
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        default[1].append(self.create_option(
+            name,
+            self.selected_object.pk,
+            self.choices.field.label_from_instance(self.selected_object),
+            selected_choices,
+            len(default[1])
+        ))
+        return [default]
+
+
+class PreloadedAutocompleteFormSet(BaseInlineFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        for name, field in form.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if not isinstance(widget, PreloadedAutocompleteSelect):
+                continue
+            attname = form.instance._meta.get_field(name).attname
+            if getattr(form.instance, attname, None) is not None:
+                widget.selected_object = getattr(form.instance, name)
+
+
+class PreloadedAutocompleteInline(admin.TabularInline):
+    formset = PreloadedAutocompleteFormSet
+
+    def get_queryset(self, request):
+        return super().get_queryset(request) \
+            .select_related(*self.get_autocomplete_fields(request))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field,
+                self.admin_site,
+                using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
 @admin.register(models.Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'products_count']
@@ -21,10 +89,6 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['title__istartswith']
     ordering = ['title']
 
-    def get_queryset(self, request):
-        return super().get_queryset(request) \
-            .annotate(products_count=Count('products'))
-
     @admin.display(description='#products', ordering='products_count')
     def products_count(self, category):
         url = (
@@ -74,21 +138,20 @@ class StockFilter(admin.SimpleListFilter):
 class ProductAdmin(admin.ModelAdmin):
     list_display = [
         'id', 'title', 'stock', 'category',
-        'comments_count', 'price'
+        'comments_count', 'price', 'effective_price'
     ]
     list_display_links = ['id', 'title']
     list_editable = ['price']
     list_filter = ['created_at', StockFilter]
     list_per_page = 10
+    list_select_related = ['category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     autocomplete_fields = ['category']
     prepopulated_fields = {'slug': ['title']}
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'effective_price']
     search_fields = ['title__istartswith']
 
-    def get_queryset(self, request):
-        return super().get_queryset(request) \
-            .annotate(comments_count=Count('comments'))
-
     @admin.display(description='#comments', ordering='comments_count')
     def comments_count(self, product):
         url = (
@@ -109,14 +172,22 @@ class CommentAdmin(admin.ModelAdmin):
     list_editable = ['status']
     list_filter = ['status']
     list_per_page = 10
+    list_select_related = ['product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     autocomplete_fields = ['product']
     readonly_fields = ['created_at']
     search_fields = ['product__title__istartswith']
     actions = ['set_as_pending', 'set_as_approved', 'set_as_not_approved']
 
+    def update_status(self, queryset, status):
+        updated_counts, product_ids = counters.set_comment_status(queryset, status)
+        cache.invalidate_comment_feeds(product_ids)
+        return updated_counts
+
     @admin.action(description='Set as pending')
     def set_as_pending(self, request, queryset):
-        updated_counts = queryset.update(status=models.Comment.STATUS_PENDING)
+        updated_counts = self.update_status(queryset, models.Comment.STATUS_PENDING)
         pluralized_comments = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -126,7 +197,7 @@ class CommentAdmin(admin.ModelAdmin):
 
     @admin.action(description='Set as approved')
     def set_as_approved(self, request, queryset):
-        updated_counts = queryset.update(status=models.Comment.STATUS_APPROVED)
+        updated_counts = self.update_status(queryset, models.Comment.STATUS_APPROVED)
         pluralized_comments = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -136,7 +207,7 @@ class CommentAdmin(admin.ModelAdmin):
 
     @admin.action(description='Set as not approved')
     def set_as_not_approved(self, request, queryset):
-        updated_counts = queryset.update(status=models.Comment.STATUS_NOT_APPROVED)
+        updated_counts = self.update_status(queryset, models.Comment.STATUS_NOT_APPROVED)
         pluralized_comments = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -156,6 +227,7 @@ class CustomerAdmin(admin.ModelAdmin):
     list_display = ['email', 'first_name', 'last_name']
     list_display_links = ['email']
     list_per_page = 10
+    list_select_related = ['user']
     search_fields = [
         'user__first_name__istartswith',
         'user__last_name__istartswith'
@@ -178,59 +250,140 @@ class AddressAdmin(admin.ModelAdmin):
     list_display = ['customer', 'province', 'city']
     list_display_links = ['customer']
     list_per_page = 10
+    list_select_related = ['customer__user']
     autocomplete_fields = ['customer']
-    search_fields = ['first_name__istartswith', 'last_name__istartswith']
+    search_fields = [
+        'customer__user__first_name__istartswith',
+        'customer__user__last_name__istartswith'
+    ]
+
+
+def get_request_shard(request):
+    # Change and add views keep the changelist's filters in one parameter.
+    params = request.GET
+    if '_changelist_filters' in params:
+        params = QueryDict(params['_changelist_filters'])
+    shard = params.get(CartShardFilter.parameter_name)
+    if shard in get_cart_shards():
+        return shard
+    return get_cart_shards()[0]
+
 
+class CartShardFilter(admin.SimpleListFilter):
+    # Carts are spread over several databases; a changelist shows one of them.
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.shard = get_request_shard(request)
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in get_cart_shards()]
+
+    def choices(self, changelist):
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == self.shard,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        # The admin's queryset is already bound to the shard.
+        return queryset
 
-class CartItemInline(admin.TabularInline):
+
+class CartShardAdminMixin:
+    def get_list_filter(self, request):
+        return [CartShardFilter, *super().get_list_filter(request)]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(get_request_shard(request))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'cart':
+            kwargs['using'] = get_request_shard(request)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class CartItemFormSet(PreloadedAutocompleteFormSet):
+    def __init__(self, data=None, files=None, instance=None, save_as_new=False,
+                 prefix=None, queryset=None, **kwargs):
+        if instance is not None and queryset is not None:
+            # Items are read from their cart's shard; products from the
+            # primary, as they are not on the shard to be joined.
+            queryset = queryset.using(get_cart_shard(instance.pk)).select_related(None)
+        super().__init__(data, files, instance, save_as_new, prefix, queryset, **kwargs)
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = attach_products(list(super().get_queryset()))
+        return self._queryset
+
+
+class CartItemInline(PreloadedAutocompleteInline):
     model = models.CartItem
+    formset = CartItemFormSet
     fields = ['product', 'quantity']
+    autocomplete_fields = ['product']
     extra = 0
     min_num = 1
 
 
 @admin.register(models.Cart)
-class CartAdmin(admin.ModelAdmin):
-    list_display = ['id', 'created_at', 'total']
+class CartAdmin(CartShardAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'created_at', 'items_count', 'total']
     list_filter = ['created_at']
     list_per_page = 10
     readonly_fields = ['created_at']
     inlines = [CartItemInline]
 
-    def get_queryset(self, request):
-        return super().get_queryset(request) \
-            .annotate(total=ExpressionWrapper(
-                Sum(F('items__quantity') * F('items__product__price')),
-                output_field=DecimalField()
-            ))
+    def get_object(self, request, object_id, from_field=None):
+        # A cart's id tells its shard, whatever shard the changelist showed.
+        try:
+            return self.get_queryset(request) \
+                .using(get_cart_shard(object_id)) \
+                .get(pk=object_id)
+        except (models.Cart.DoesNotExist, ValidationError, ValueError):
+            return None
 
-    @admin.display(ordering='total')
+    @admin.display(ordering='subtotal')
     def total(self, cart):
-        return cart.total
+        return cart.subtotal
 
 
 @admin.register(models.CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(CartShardAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'cart', 'product', 'quantity', 'price', 'total']
     list_per_page = 10
+    list_select_related = ['cart']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_queryset(self, request):
         return super().get_queryset(request) \
             .annotate(total=ExpressionWrapper(
-                F('quantity') * F('product__price'),
+                F('quantity') * F('unit_price'),
                 output_field=DecimalField()
             ))
 
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        changelist.result_list = attach_products(list(changelist.result_list))
+        return changelist
+
     def total(self, cart_item):
         return cart_item.total
 
     def price(self, cart_item):
-        return cart_item.product.price
+        return cart_item.unit_price
 
 
-class OrderItemInline(admin.TabularInline):
+class OrderItemInline(PreloadedAutocompleteInline):
     model = models.OrderItem
     fields = ['quantity', 'price', 'product']
+    autocomplete_fields = ['product']
     extra = 0
     min_num = 1
 
@@ -241,6 +394,10 @@ class OrderAdmin(admin.ModelAdmin):
     list_editable = ['status']
     list_filter = ['created_at', 'status']
     list_per_page = 10
+    list_select_related = ['customer__user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ['customer']
     readonly_fields = ['created_at']
     actions = ['set_as_paid', 'set_as_unpaid', 'set_as_canceled']
     inlines = [OrderItemInline]
@@ -258,9 +415,22 @@ class OrderAdmin(admin.ModelAdmin):
     def total(self, order):
         return order.total
 
+    def save_model(self, request, obj, form, change):
+        obj._previous_sales = rollups.get_order_sales([obj.pk]) if change else {}
+        obj._previous_pairs = recommendations.get_order_pairs([obj.pk]) if change else Counter()
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Runs after the inline items are saved, so the rollups see the
+        # order's final items and status.
+        order = form.instance
+        rollups.update_order_sales([order.pk], order._previous_sales)
+        recommendations.update_order_pairs([order.pk], order._previous_pairs)
+
     @admin.action(description='Set as paid')
     def set_as_paid(self, request, queryset):
-        updated_counts = queryset.update(status=models.Order.STATUS_PAID)
+        updated_counts = rollups.set_order_status(queryset, models.Order.STATUS_PAID)
         pluralized_orders = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -270,7 +440,7 @@ class OrderAdmin(admin.ModelAdmin):
 
     @admin.action(description='Set as unpaid')
     def set_as_unpaid(self, request, queryset):
-        updated_counts = queryset.update(status=models.Order.STATUS_UNPAID)
+        updated_counts = rollups.set_order_status(queryset, models.Order.STATUS_UNPAID)
         pluralized_orders = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -280,7 +450,7 @@ class OrderAdmin(admin.ModelAdmin):
 
     @admin.action(description='Set as canceled')
     def set_as_canceled(self, request, queryset):
-        updated_counts = queryset.update(status=models.Order.STATUS_CANCELED)
+        updated_counts = rollups.set_order_status(queryset, models.Order.STATUS_CANCELED)
         pluralized_orders = pluralize_objects(updated_counts)
 
         self.message_user(
@@ -293,15 +463,32 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['id', 'order', 'product', 'quantity', 'price', 'total']
     list_per_page = 10
+    list_select_related = ['order', 'product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     autocomplete_fields = ['product']
 
     def get_queryset(self, request):
         return super().get_queryset(request) \
             .annotate(total=ExpressionWrapper(
-                Sum(F('quantity') * F('price')),
+                F('quantity') * F('price'),
                 output_field=DecimalField()
             ))
 
     @admin.display(ordering='total')
     def total(self, order):
         return order.total
+
+    def save_model(self, request, obj, form, change):
+        order_ids = {obj.order_id, form.initial.get('order')} - {None}
+        with rollups.refreshing_order_sales(order_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with rollups.refreshing_order_sales([obj.order_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        order_ids = set(queryset.values_list('order_id', flat=True))
+        with rollups.refreshing_order_sales(order_ids):
+            super().delete_queryset(request, queryset)
@@ -0,0 +1,143 @@
+from urllib.parse import urlsplit
+import asyncio
+import io
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ['GET', 'HEAD', 'OPTIONS']
+ALLOWED_METHODS = SAFE_METHODS + ['POST', 'PUT', 'PATCH', 'DELETE']
+# Headers describing the batch request itself; credentials are replaced by
+# the user authenticated once for the whole batch, bodies are always
+# returned uncompressed to be embedded in the batch response, and one
+# idempotency key cannot cover several different writes.
+EXCLUDED_META = [
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_ACCEPT_ENCODING', 'HTTP_AUTHORIZATION',
+    'HTTP_COOKIE', 'HTTP_IDEMPOTENCY_KEY', 'PATH_INFO', 'QUERY_STRING',
+    'REQUEST_METHOD', 'wsgi.input',
+]
+
+
+class BatchError(Exception):
+    pass
+
+
+def clean_sub_request(data):
+    if not isinstance(data, dict):
+        raise BatchError('Each request must be an object.')
+
+    method = str(data.get('method') or 'GET').upper()
+    if method not in ALLOWED_METHODS:
+        raise BatchError(f'Method must be one of: {", ".join(ALLOWED_METHODS)}.')
+
+    url = urlsplit(str(data.get('path') or ''))
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        match = None
+    if match is None or match.namespace != 'store' or match.url_name == 'batch':
+        raise BatchError('Path must be a store endpoint.')
+
+    return {
+        'id': data.get('id'),
+        'method': method,
+        'path': url.path,
+        'query': url.query,
+        'body': data.get('body'),
+        'match': match,
+    }
+
+
+def build_sub_request(parent, user, auth, sub_request):
+    request = HttpRequest()
+    request.method = sub_request['method']
+    request.path = request.path_info = sub_request['path']
+    request.META = {
+        key: value for key, value in parent.META.items() if key not in EXCLUDED_META
+    }
+
+    content = b''
+    if sub_request['body'] is not None:
+        content = json.dumps(sub_request['body']).encode()
+    request.META.update({
+        'REQUEST_METHOD': sub_request['method'],
+        'PATH_INFO': sub_request['path'],
+        'QUERY_STRING': sub_request['query'],
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    request.GET = QueryDict(sub_request['query'])
+    request.resolver_match = sub_request['match']
+    request._stream = io.BytesIO(content)
+    request._read_started = False
+
+    # DRF views skip their authenticators for a forced user.
+    request.user = user
+    if user.is_authenticated:
+        request._force_auth_user = user
+        request._force_auth_token = auth
+    return request
+
+
+def execute(request):
+    match = request.resolver_match
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Batched request to %s failed', request.path)
+        return {'status': 500, 'body': {'detail': 'Internal server error.'}}
+
+    if response.streaming:
+        return {'status': 400, 'body': {'detail': 'Streaming responses cannot be batched.'}}
+    body = None
+    if response.content and response.get('Content-Type', '').startswith('application/json'):
+        body = json.loads(response.content)
+    return {'status': response.status_code, 'body': body}
+
+
+def execute_in_worker(request):
+    try:
+        return execute(request)
+    finally:
+        # Worker threads are not covered by the request's connection cleanup.
+        connections.close_all()
+
+
+async def execute_reads(requests, semaphore):
+    if len(requests) == 1:
+        return [await sync_to_async(execute)(requests[0])]
+
+    async def execute_read(request):
+        async with semaphore:
+            return await sync_to_async(execute_in_worker, thread_sensitive=False)(request)
+
+    return await asyncio.gather(*[execute_read(request) for request in requests])
+
+
+async def execute_batch(requests):
+    # Consecutive reads run concurrently; a write waits for the reads before
+    # it and runs alone on the request's connection, so batches keep their
+    # order of effects.
+    semaphore = asyncio.Semaphore(settings.BATCH['MAX_CONCURRENCY'])
+    results = []
+    reads = []
+    for request in requests:
+        if request.method in SAFE_METHODS:
+            reads.append(request)
+            continue
+        if reads:
+            results.extend(await execute_reads(reads, semaphore))
+            reads = []
+        results.append(await sync_to_async(execute)(request))
+    if reads:
+        results.extend(await execute_reads(reads, semaphore))
+    return results
@@ -0,0 +1,158 @@
+from urllib.parse import urlencode
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from store import models
+
+PRODUCT_ID_KEY = 'store:products:slug:{}:id'
+COMMENT_FEED_KEY = 'store:comments:{}:first-page'
+CATALOG_VERSION_KEY = 'store:catalog:version'
+PRODUCT_FACETS_KEY = 'store:catalog:{}:facets:{}'
+TOP_PRODUCTS_KEY = 'store:catalog:{}:categories:{}:top-products'
+PRODUCT_KEY = 'store:catalog:{}:products:{}'
+CATALOG_RESPONSE_KEY = 'store:catalog:{}:responses:{}:{}'
+
+
+def get_product_id_key(product_slug):
+    return PRODUCT_ID_KEY.format(product_slug)
+
+
+def get_product_id(product_slug):
+    key = get_product_id_key(product_slug)
+    product_id = cache.get(key)
+    if product_id is None:
+        product_id = models.Product.objects.filter(slug=product_slug) \
+            .values_list('pk', flat=True) \
+            .first()
+        if product_id is not None:
+            cache.set(key, product_id, settings.PRODUCT_ID_CACHE_TIMEOUT)
+    return product_id
+
+
+def get_product_ids(product_slugs):
+    keys = {get_product_id_key(slug): slug for slug in product_slugs}
+    product_ids = {keys[key]: pk for key, pk in cache.get_many(keys).items()}
+    missing_slugs = [slug for slug in product_slugs if slug not in product_ids]
+    if missing_slugs:
+        found_ids = dict(
+            models.Product.objects.filter(slug__in=missing_slugs)
+            .values_list('slug', 'pk')
+        )
+        cache.set_many(
+            {get_product_id_key(slug): pk for slug, pk in found_ids.items()},
+            settings.PRODUCT_ID_CACHE_TIMEOUT
+        )
+        product_ids.update(found_ids)
+    return product_ids
+
+
+def invalidate_product_id(product_slug):
+    cache.delete(get_product_id_key(product_slug))
+
+
+def get_comment_feed_key(product_id):
+    return COMMENT_FEED_KEY.format(product_id)
+
+
+def get_comment_feed(product_id):
+    return cache.get(get_comment_feed_key(product_id))
+
+
+def set_comment_feed(product_id, data):
+    cache.set(
+        get_comment_feed_key(product_id),
+        data,
+        settings.COMMENT_FEED_CACHE_TIMEOUT
+    )
+
+
+def invalidate_comment_feeds(product_ids):
+    cache.delete_many([get_comment_feed_key(pk) for pk in product_ids])
+
+
+def get_catalog_version():
+    # Seeded from the clock so a version lost to eviction never goes back
+    # to a value older entries were stored under.
+    return cache.get_or_set(CATALOG_VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def get_product_facets_key(params):
+    digest = hashlib.md5(urlencode(sorted(params)).encode()).hexdigest()
+    return PRODUCT_FACETS_KEY.format(get_catalog_version(), digest)
+
+
+def get_product_facets(params):
+    return cache.get(get_product_facets_key(params))
+
+
+def set_product_facets(params, facets):
+    cache.set(
+        get_product_facets_key(params),
+        facets,
+        settings.PRODUCT_FACETS_CACHE_TIMEOUT
+    )
+
+
+def get_top_products_cache():
+    return caches[settings.POPULARITY['TOP_PRODUCTS_CACHE_ALIAS']]
+
+
+def get_top_products_key(category_id):
+    return TOP_PRODUCTS_KEY.format(get_catalog_version(), category_id)
+
+
+def get_top_products(category_id):
+    return get_top_products_cache().get(get_top_products_key(category_id))
+
+
+def set_top_products(category_id, data):
+    get_top_products_cache().set(
+        get_top_products_key(category_id),
+        data,
+        settings.POPULARITY['TOP_PRODUCTS_CACHE_TIMEOUT']
+    )
+
+
+def get_product_key(product_id, version):
+    return PRODUCT_KEY.format(version, product_id)
+
+
+def get_products(product_ids):
+    version = get_catalog_version()
+    keys = {get_product_key(pk, version): pk for pk in product_ids}
+    return {keys[key]: data for key, data in cache.get_many(keys).items()}
+
+
+def set_products(products):
+    version = get_catalog_version()
+    cache.set_many(
+        {get_product_key(pk, version): data for pk, data in products.items()},
+        settings.PRODUCT_CACHE_TIMEOUT
+    )
+
+
+def get_catalog_response_key(request_key, encoding):
+    digest = hashlib.md5(request_key.encode()).hexdigest()
+    return CATALOG_RESPONSE_KEY.format(get_catalog_version(), digest, encoding or 'identity')
+
+
+def get_catalog_response(request_key, encoding):
+    return cache.get(get_catalog_response_key(request_key, encoding))
+
+
+def set_catalog_response(request_key, encoding, response):
+    cache.set(
+        get_catalog_response_key(request_key, encoding),
+        response,
+        settings.CATALOG_RESPONSE_CACHE_TIMEOUT
+    )
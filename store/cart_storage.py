@@ -0,0 +1,407 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+from uuid import uuid4
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from store import carts
+from store import models
+from store.sharding import get_cart_shard
+
+logger = logging.getLogger(__name__)
+
+
+class CartLockTimeout(Exception):
+    pass
+
+
+def set_prefetched_items(cart, items):
+    queryset = cart.items.all()
+    queryset._result_cache = items
+    queryset._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': queryset}
+
+
+def attach_products(items):
+    # Products live on the primary database, so they are loaded separately
+    # instead of joined to items on a cart shard.
+    product_ids = {item.product_id for item in items}
+    products = models.Product.objects.in_bulk(product_ids) if product_ids else {}
+    for item in items:
+        item.product = products.get(item.product_id)
+    return [item for item in items if item.product is not None]
+
+
+class DatabaseCartStorage:
+    def create_cart(self):
+        cart_id = uuid4()
+        # A Decimal like the one loaded carts have, so totals render alike.
+        cart = models.Cart.objects.using(get_cart_shard(cart_id)) \
+            .create(id=cart_id, subtotal=Decimal(0))
+        set_prefetched_items(cart, [])
+        return cart
+
+    def get_cart(self, cart_id, include_items=True):
+        cart = models.Cart.objects.using(get_cart_shard(cart_id)) \
+            .filter(pk=cart_id) \
+            .first()
+        if cart is not None:
+            set_prefetched_items(cart, self.get_items(cart_id) if include_items else [])
+        return cart
+
+    def delete_cart(self, cart_id):
+        deleted_counts, _ = models.Cart.objects.using(get_cart_shard(cart_id)) \
+            .filter(pk=cart_id) \
+            .delete()
+        return deleted_counts > 0
+
+    def get_items(self, cart_id):
+        return attach_products(list(
+            models.CartItem.objects.using(get_cart_shard(cart_id))
+            .filter(cart_id=cart_id)
+        ))
+
+    def get_item(self, cart_id, item_pk):
+        items = attach_products(list(
+            models.CartItem.objects.using(get_cart_shard(cart_id))
+            .filter(cart_id=cart_id, pk=item_pk)
+        ))
+        return items[0] if items else None
+
+    def add_item(self, cart_id, product, quantity):
+        shard = get_cart_shard(cart_id)
+        with transaction.atomic(using=shard):
+            if not models.Cart.objects.using(shard).filter(pk=cart_id).exists():
+                return None
+
+            try:
+                cart_item = models.CartItem.objects.using(shard) \
+                    .get(cart_id=cart_id, product_id=product.pk)
+                cart_item.product = product
+                cart_item.quantity += quantity
+            except models.CartItem.DoesNotExist:
+                cart_item = models.CartItem(
+                    cart_id=cart_id,
+                    product=product,
+                    quantity=quantity
+                )
+            cart_item.save(using=shard)
+        return cart_item
+
+    def update_item(self, cart_item, quantity):
+        with transaction.atomic(using=cart_item._state.db):
+            cart_item.quantity = quantity
+            cart_item.save()
+        return cart_item
+
+    def remove_item(self, cart_item):
+        cart_item.delete()
+
+    @contextmanager
+    def checkout(self, cart_id):
+        shard = get_cart_shard(cart_id)
+        with transaction.atomic(using=shard):
+            # Locking the cart row makes concurrent item writes wait for the
+            # order to be created from this snapshot.
+            cart = models.Cart.objects.using(shard) \
+                .select_for_update() \
+                .filter(pk=cart_id) \
+                .first()
+            yield [] if cart is None else self.get_items(cart_id)
+            models.Cart.objects.using(shard).filter(pk=cart_id).delete()
+
+
+class CacheCartStorage:
+    key_prefix = 'store:cart:'
+
+    def __init__(self):
+        options = settings.CART_STORAGE
+        self.cache = caches[options['CACHE_ALIAS']]
+        self.timeout = settings.CART_TTL.total_seconds()
+        self.flush_interval = options['FLUSH_INTERVAL']
+        self.lock_timeout = options['LOCK_TIMEOUT']
+        self.dirty_cart_ids = set()
+        self.dirty_lock = threading.Lock()
+        self.timer = None
+
+    def get_state_key(self, cart_id):
+        return f'{self.key_prefix}{cart_id}'
+
+    @contextmanager
+    def lock(self, cart_id):
+        key = f'{self.get_state_key(cart_id)}:lock'
+        deadline = time.monotonic() + self.lock_timeout
+        # The lock outlives the wait, so a waiter gives up instead of taking
+        # over a cart a slow checkout still reads; it expires only to free
+        # carts whose holder died.
+        while not self.cache.add(key, True, self.lock_timeout * 2):
+            if time.monotonic() > deadline:
+                raise CartLockTimeout(f'Could not lock cart {cart_id}.')
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            self.cache.delete(key)
+
+    def load_state(self, cart_id):
+        key = self.get_state_key(cart_id)
+        state = self.cache.get(key)
+        if state is None:
+            shard = get_cart_shard(cart_id)
+            cart = models.Cart.objects.using(shard).filter(pk=cart_id).first()
+            if cart is None:
+                return None
+            state = {
+                'created_at': cart.created_at,
+                'deleted': False,
+                'items': {
+                    pk: [product_id, quantity]
+                    for pk, product_id, quantity in models.CartItem.objects
+                    .using(shard)
+                    .filter(cart_id=cart_id)
+                    .values_list('pk', 'product_id', 'quantity')
+                },
+            }
+            self.cache.add(key, state, self.timeout)
+            state = self.cache.get(key, state)
+
+        if state['deleted']:
+            return None
+        return state
+
+    def save_state(self, cart_id, state):
+        self.cache.set(self.get_state_key(cart_id), state, self.timeout)
+        self.mark_dirty(cart_id)
+
+    def build_cart(self, cart_id, state):
+        product_ids = {product_id for product_id, _ in state['items'].values()}
+        products = models.Product.objects.in_bulk(product_ids) if product_ids else {}
+
+        cart = models.Cart(id=cart_id, created_at=state['created_at'])
+        items = [
+            models.CartItem(
+                pk=pk,
+                cart_id=cart_id,
+                product=products[product_id],
+                quantity=quantity
+            )
+            for pk, (product_id, quantity) in sorted(state['items'].items())
+            if product_id in products
+        ]
+        cart.subtotal = sum(
+            (item.quantity * item.product.effective_price for item in items),
+            Decimal(0)
+        )
+        cart.items_count = sum(item.quantity for item in items)
+        set_prefetched_items(cart, items)
+        return cart
+
+    def create_cart(self):
+        cart_id = uuid4()
+        state = {'created_at': timezone.now(), 'deleted': False, 'items': {}}
+        self.save_state(cart_id, state)
+        return self.build_cart(cart_id, state)
+
+    def get_cart(self, cart_id, include_items=True):
+        # The subtotal is computed from the items, so they are always built.
+        state = self.load_state(cart_id)
+        if state is None:
+            return None
+        return self.build_cart(cart_id, state)
+
+    def delete_cart(self, cart_id):
+        with self.lock(cart_id):
+            if self.load_state(cart_id) is None:
+                return False
+            self.save_state(cart_id, {'deleted': True})
+        return True
+
+    def get_items(self, cart_id):
+        cart = self.get_cart(cart_id)
+        return [] if cart is None else list(cart.items.all())
+
+    def get_item(self, cart_id, item_pk):
+        state = self.load_state(cart_id)
+        if state is None or item_pk not in state['items']:
+            return None
+
+        product_id, quantity = state['items'][item_pk]
+        product = models.Product.objects.filter(pk=product_id).first()
+        if product is None:
+            return None
+        return models.CartItem(
+            pk=item_pk,
+            cart_id=cart_id,
+            product=product,
+            quantity=quantity
+        )
+
+    def add_item(self, cart_id, product, quantity):
+        with self.lock(cart_id):
+            state = self.load_state(cart_id)
+            if state is None:
+                return None
+
+            for pk, (product_id, item_quantity) in state['items'].items():
+                if product_id == product.pk:
+                    item_pk = pk
+                    quantity += item_quantity
+                    break
+            else:
+                item_pk = self.allocate_item_pk(cart_id, state, product.pk, quantity)
+
+            state['items'][item_pk] = [product.pk, quantity]
+            self.save_state(cart_id, state)
+
+        return models.CartItem(
+            pk=item_pk,
+            cart_id=cart_id,
+            product=product,
+            quantity=quantity
+        )
+
+    def update_item(self, cart_item, quantity):
+        with self.lock(cart_item.cart_id):
+            state = self.load_state(cart_item.cart_id)
+            if state is None or cart_item.pk not in state['items']:
+                raise models.CartItem.DoesNotExist
+            state['items'][cart_item.pk][1] = quantity
+            self.save_state(cart_item.cart_id, state)
+
+        cart_item.quantity = quantity
+        return cart_item
+
+    def remove_item(self, cart_item):
+        with self.lock(cart_item.cart_id):
+            state = self.load_state(cart_item.cart_id)
+            if state is not None and state['items'].pop(cart_item.pk, None):
+                self.save_state(cart_item.cart_id, state)
+
+    @contextmanager
+    def checkout(self, cart_id):
+        with self.lock(cart_id):
+            state = self.load_state(cart_id)
+            cart = None if state is None else self.build_cart(cart_id, state)
+            yield [] if cart is None else list(cart.items.all())
+
+            shard = get_cart_shard(cart_id)
+            models.Cart.objects.using(shard).filter(pk=cart_id).delete()
+            transaction.on_commit(
+                lambda: self.cache.delete(self.get_state_key(cart_id)),
+                using=shard
+            )
+            with self.dirty_lock:
+                self.dirty_cart_ids.discard(cart_id)
+
+    def allocate_item_pk(self, cart_id, state, product_id, quantity):
+        shard = get_cart_shard(cart_id)
+        connection = connections[shard]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id'))",
+                    [models.CartItem._meta.db_table]
+                )
+                return cursor.fetchone()[0]
+
+        # Without sequences new items are written through to get their pk.
+        self.write_cart(cart_id, state)
+        return models.CartItem.objects.using(shard).create(
+            cart_id=cart_id,
+            product_id=product_id,
+            quantity=quantity
+        ).pk
+
+    def mark_dirty(self, cart_id):
+        with self.dirty_lock:
+            self.dirty_cart_ids.add(cart_id)
+            if self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        with self.dirty_lock:
+            cart_ids = self.dirty_cart_ids
+            self.dirty_cart_ids = set()
+            self.timer = None
+
+        for cart_id in cart_ids:
+            try:
+                with self.lock(cart_id):
+                    state = self.cache.get(self.get_state_key(cart_id))
+                    if state is not None:
+                        self.write_cart(cart_id, state)
+            except Exception:
+                logger.exception('Flushing cart %s failed', cart_id)
+                self.mark_dirty(cart_id)
+
+    def write_cart(self, cart_id, state):
+        shard = get_cart_shard(cart_id)
+        with transaction.atomic(using=shard):
+            if state['deleted']:
+                models.Cart.objects.using(shard).filter(pk=cart_id).delete()
+                self.cache.delete(self.get_state_key(cart_id))
+                return
+
+            models.Cart.objects.using(shard).bulk_create(
+                [models.Cart(id=cart_id, created_at=state['created_at'])],
+                ignore_conflicts=True
+            )
+
+            prices = dict(
+                models.Product.objects
+                .filter(pk__in=[product_id for product_id, _ in state['items'].values()])
+                .values_list('pk', 'effective_price')
+            )
+            items = [
+                models.CartItem(
+                    pk=pk,
+                    cart_id=cart_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_price=prices[product_id]
+                )
+                for pk, (product_id, quantity) in state['items'].items()
+                if product_id in prices
+            ]
+
+            # Raw deletes and bulk upserts skip the per-item signals; the totals
+            # are refreshed once below.
+            models.CartItem.objects.using(shard) \
+                .filter(cart_id=cart_id) \
+                .exclude(pk__in=[item.pk for item in items]) \
+                ._raw_delete(shard)
+            models.CartItem.objects.using(shard).bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['quantity', 'unit_price']
+            )
+            carts.refresh_cart_totals(
+                models.Cart.objects.using(shard).filter(pk=cart_id),
+                touch=True
+            )
+
+
+@lru_cache
+def load_cart_storage(backend):
+    return import_string(backend)()
+
+
+def get_cart_storage():
+    return load_cart_storage(settings.CART_STORAGE['BACKEND'])
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+
+from store import models
+from store.sharding import get_cart_shards
+
+
+def get_cart_totals():
+    # Items carry a copy of the product price so totals never join products,
+    # which may live on another database.
+    items = models.CartItem.objects.filter(cart_id=OuterRef('pk')) \
+        .order_by() \
+        .values('cart_id')
+    return {
+        'subtotal': Coalesce(
+            Subquery(
+                items.annotate(
+                    subtotal=Sum(F('quantity') * F('unit_price'))
+                ).values('subtotal')
+            ),
+            Value(Decimal(0)),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        'items_count': Coalesce(
+            Subquery(
+                items.annotate(items_count=Sum('quantity')).values('items_count')
+            ),
+            Value(0),
+            output_field=IntegerField()
+        ),
+    }
+
+
+def refresh_cart_totals(queryset, touch=False):
+    updates = get_cart_totals()
+    if touch:
+        updates['updated_at'] = Now()
+    return queryset.update(**updates)
+
+
+def refresh_carts_for_products(product_ids):
+    prices = dict(
+        models.Product.objects.filter(pk__in=product_ids).values_list('pk', 'effective_price')
+    )
+    if not prices:
+        return 0
+
+    unit_price = Case(
+        *[When(product_id=pk, then=Value(price)) for pk, price in prices.items()],
+        output_field=DecimalField(max_digits=6, decimal_places=2)
+    )
+    refreshed_count = 0
+    # Two UPDATEs per shard for every cart holding any of the products.
+    for alias in get_cart_shards():
+        items = models.CartItem.objects.using(alias).filter(product_id__in=prices)
+        items.update(unit_price=unit_price)
+        refreshed_count += refresh_cart_totals(
+            models.Cart.objects.using(alias).filter(pk__in=items.values('cart_id'))
+        )
+    return refreshed_count
+
+
+def delete_cart_items_for_product(product_id):
+    for alias in get_cart_shards():
+        items = models.CartItem.objects.using(alias).filter(product_id=product_id)
+        cart_ids = list(items.values_list('cart_id', flat=True).distinct())
+        if cart_ids:
+            items._raw_delete(alias)
+            refresh_cart_totals(models.Cart.objects.using(alias).filter(pk__in=cart_ids))
@@ -0,0 +1,111 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from store import models
+
+COMMENT_STATUS_COUNTERS = {
+    models.Comment.STATUS_APPROVED: 'approved_comments_count',
+    models.Comment.STATUS_PENDING: 'pending_comments_count',
+}
+
+
+def add_comments(product_id, status, delta):
+    updates = {'comments_count': F('comments_count') + delta}
+    status_counter = COMMENT_STATUS_COUNTERS.get(status)
+    if status_counter is not None:
+        updates[status_counter] = F(status_counter) + delta
+    models.Product.objects.filter(pk=product_id).update(**updates)
+
+
+def move_comments(product_id, old_status, new_status, count):
+    updates = {}
+    old_counter = COMMENT_STATUS_COUNTERS.get(old_status)
+    new_counter = COMMENT_STATUS_COUNTERS.get(new_status)
+    if old_counter is not None:
+        updates[old_counter] = F(old_counter) - count
+    if new_counter is not None:
+        updates[new_counter] = F(new_counter) + count
+    if updates:
+        models.Product.objects.filter(pk=product_id).update(**updates)
+
+
+def set_comment_status(queryset, status):
+    with transaction.atomic():
+        comments = list(
+            queryset.select_for_update()
+            .values_list('pk', 'product_id', 'status')
+        )
+        updated_counts = models.Comment.objects \
+            .filter(pk__in=[pk for pk, _, _ in comments]) \
+            .update(status=status)
+
+        moved_comments = Counter(
+            (product_id, old_status)
+            for _, product_id, old_status in comments
+            if old_status != status
+        )
+        for (product_id, old_status), count in moved_comments.items():
+            move_comments(product_id, old_status, status, count)
+
+    product_ids = {product_id for _, product_id, _ in comments}
+    return updated_counts, product_ids
+
+
+def add_products(category_id, delta):
+    models.Category.objects.filter(pk=category_id) \
+        .update(products_count=F('products_count') + delta)
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def reconcile_product_counters(queryset):
+    comments = models.Comment.objects.filter(product_id=OuterRef('pk'))
+    actual_counts = {
+        'comments_count': count_subquery(comments, 'product_id'),
+        'approved_comments_count': count_subquery(
+            comments.filter(status=models.Comment.STATUS_APPROVED),
+            'product_id'
+        ),
+        'pending_comments_count': count_subquery(
+            comments.filter(status=models.Comment.STATUS_PENDING),
+            'product_id'
+        ),
+    }
+    drifted_pks = list(
+        queryset.annotate(**{f'actual_{name}': count for name, count in actual_counts.items()})
+        .exclude(**{name: F(f'actual_{name}') for name in actual_counts})
+        .values_list('pk', flat=True)
+    )
+    if drifted_pks:
+        models.Product.objects.filter(pk__in=drifted_pks).update(**actual_counts)
+    return len(drifted_pks)
+
+
+def reconcile_category_counters(queryset):
+    actual_count = count_subquery(
+        models.Product.objects.filter(category_id=OuterRef('pk')),
+        'category_id'
+    )
+    drifted_pks = list(
+        queryset.annotate(actual_products_count=actual_count)
+        .exclude(products_count=F('actual_products_count'))
+        .values_list('pk', flat=True)
+    )
+    if drifted_pks:
+        models.Category.objects.filter(pk__in=drifted_pks) \
+            .update(products_count=actual_count)
+    return len(drifted_pks)
@@ -0,0 +1,97 @@
+from datetime import datetime, time
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from store import models
+
+# Queryset updates skip auto_now; those changing one of these columns set
+# updated_at themselves so incremental exports pick the product up.
+EXPORT_FIELDS = [
+    ('pk', 'pk'),
+    ('slug', 'slug'),
+    ('title', 'title'),
+    ('price', 'price'),
+    ('effective_price', 'effective_price'),
+    ('stock', 'stock'),
+    ('category_id', 'category_id'),
+    ('category', 'category__title'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+DESCRIPTION_FIELD = ('description', 'description')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class LineBuffer:
+    def write(self, line):
+        return line
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        since_date = parse_date(value)
+        if since_date is None:
+            raise ValueError(f'Invalid timestamp "{value}".')
+        since = datetime.combine(since_date, time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def get_export_fields(include_description=False):
+    if include_description:
+        return EXPORT_FIELDS + [DESCRIPTION_FIELD]
+    return EXPORT_FIELDS
+
+
+def get_export_rows(fields, since=None, chunk_size=None):
+    queryset = models.Product.objects.order_by('pk')
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    # values_list skips model instances and iterator() streams the rows
+    # through a server-side cursor instead of caching them.
+    return queryset.values_list(*[lookup for _, lookup in fields]) \
+        .iterator(chunk_size=chunk_size or settings.PRODUCT_EXPORT_CHUNK_SIZE)
+
+
+def iter_csv(fields, rows):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow([name for name, _ in fields])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(fields, rows):
+    names = [name for name, _ in fields]
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def iter_export(export_format, fields, rows):
+    if export_format == 'csv':
+        return iter_csv(fields, rows)
+    return iter_jsonl(fields, rows)
+
+
+def iter_batched(chunks, size=64 * 1024):
+    # Joins small row strings so writes and compression see larger blocks.
+    batch = []
+    batch_size = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        batch_size += len(chunk)
+        if batch_size >= size:
+            yield ''.join(batch).encode()
+            batch = []
+            batch_size = 0
+    if batch:
+        yield ''.join(batch).encode()
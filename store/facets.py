@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+
+def get_price_bucket(bounds):
+    return Case(
+        *[
+            When(effective_price__lt=bound, then=Value(index))
+            for index, bound in enumerate(bounds)
+        ],
+        default=Value(len(bounds)),
+        output_field=IntegerField()
+    )
+
+
+def get_product_facets(queryset):
+    bounds = settings.PRODUCT_PRICE_FACET_BOUNDS
+    # One grouped query; both facets are folded from its rows.
+    rows = queryset.order_by() \
+        .values('category_id', 'category__title', bucket=get_price_bucket(bounds)) \
+        .annotate(count=Count('pk'))
+
+    categories = {}
+    bucket_counts = defaultdict(int)
+    for row in rows:
+        category = categories.setdefault(row['category_id'], {
+            'pk': row['category_id'],
+            'title': row['category__title'],
+            'count': 0,
+        })
+        category['count'] += row['count']
+        bucket_counts[row['bucket']] += row['count']
+
+    edges = [0, *bounds, None]
+    return {
+        'categories': sorted(
+            categories.values(),
+            key=lambda category: (-category['count'], category['title'])
+        ),
+        'price': [
+            {'min': edges[index], 'max': edges[index + 1], 'count': bucket_counts[index]}
+            for index in range(len(bounds) + 1)
+        ],
+    }
@@ -1,12 +1,35 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
 from . import models
 
 
 class ProductFilter(filters.FilterSet):
+    # Prices filter on what customers pay after discounts.
+    price__gt = filters.NumberFilter(field_name='effective_price', lookup_expr='gt')
+    price__lt = filters.NumberFilter(field_name='effective_price', lookup_expr='lt')
+
     class Meta:
         model = models.Product
         fields = {
-            'price': ['gt', 'lt'],
             'category_id': ['exact']
         }
+
+
+class ProductOrderingFilter(OrderingFilter):
+    ordering_field_map = {'price': 'effective_price'}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = [
+            ('-' if field.startswith('-') else '')
+            + self.ordering_field_map.get(field.lstrip('-'), field.lstrip('-'))
+            for field in ordering
+        ]
+        # A unique tiebreak keeps pages stable and lets (popularity, id)
+        # orderings walk the composite indexes.
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
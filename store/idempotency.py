@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+RESPONSE_KEY = 'store:idempotency:{}'
+LOCK_KEY = 'store:idempotency:{}:lock'
+
+
+class IdempotencyLockTimeout(Exception):
+    pass
+
+
+def get_idempotency_cache():
+    return caches[settings.IDEMPOTENCY['CACHE_ALIAS']]
+
+
+def get_scope_key(path, user_id, idempotency_key):
+    # Keys are only unique per client, so the endpoint and user are part of it.
+    scope = json.dumps([path, user_id, idempotency_key])
+    return hashlib.md5(scope.encode()).hexdigest()
+
+
+def get_fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+@contextmanager
+def lock(scope_key):
+    # Duplicates arriving while the first request runs wait here and then
+    # find its stored response.
+    cache = get_idempotency_cache()
+    key = LOCK_KEY.format(scope_key)
+    lock_timeout = settings.IDEMPOTENCY['LOCK_TIMEOUT']
+    deadline = time.monotonic() + lock_timeout
+    # The lock outlives the wait, so a duplicate gives up rather than running
+    # again next to a slow first request.
+    while not cache.add(key, True, lock_timeout * 2):
+        if time.monotonic() > deadline:
+            raise IdempotencyLockTimeout(f'Could not lock idempotency key {scope_key}.')
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def get_response(scope_key):
+    return get_idempotency_cache().get(RESPONSE_KEY.format(scope_key))
+
+
+def set_response(scope_key, fingerprint, response):
+    get_idempotency_cache().set(
+        RESPONSE_KEY.format(scope_key),
+        {
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+        },
+        settings.IDEMPOTENCY['TTL'].total_seconds()
+    )
@@ -0,0 +1,258 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+import csv
+import json
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+from django.utils import timezone
+
+from store import cache
+from store import counters
+from store import models
+from store import pricing
+
+IMPORT_FORMATS = ['csv', 'jsonl']
+MAX_PRICE = Decimal('9999.99')
+MAX_REPORTED_REJECTIONS = 100
+STAGING_TABLE = 'store_product_import'
+
+
+def iter_records(stream, import_format):
+    if import_format == 'csv':
+        for line_number, record in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, record
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, record
+
+
+def clean_record(record):
+    if not isinstance(record, dict):
+        raise ValidationError('Row is not a valid JSON object.')
+
+    errors = []
+    slug = str(record.get('slug') or '').strip()
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        errors.append('slug: enter a valid slug.')
+    if len(slug) > models.Product._meta.get_field('slug').max_length:
+        errors.append('slug: too long.')
+
+    title = str(record.get('title') or '').strip()
+    if not title or len(title) > 255:
+        errors.append('title: required, at most 255 characters.')
+
+    category = str(record.get('category') or '').strip()
+    if not category or len(category) > 255:
+        errors.append('category: required, at most 255 characters.')
+
+    try:
+        price = Decimal(str(record.get('price'))).quantize(Decimal('0.01'))
+        if not 0 <= price <= MAX_PRICE:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        errors.append(f'price: enter a number between 0 and {MAX_PRICE}.')
+        price = None
+
+    try:
+        stock = int(record.get('stock') or 0)
+        if stock < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors.append('stock: enter a whole number of at least 0.')
+        stock = None
+
+    if errors:
+        raise ValidationError(errors)
+    return {
+        'slug': slug,
+        'title': title,
+        'description': str(record.get('description') or ''),
+        'price': price,
+        'stock': stock,
+        'category': category,
+    }
+
+
+class ProductImporter:
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+        self.category_ids = {}
+        self.created_count = 0
+        self.updated_count = 0
+        self.categories_created_count = 0
+        self.rejected_count = 0
+        self.rejected_rows = []
+
+    def import_stream(self, stream, import_format):
+        started = time.monotonic()
+        records = iter_records(stream, import_format)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        processed_count = self.created_count + self.updated_count + self.rejected_count
+        return {
+            'created': self.created_count,
+            'updated': self.updated_count,
+            'categories_created': self.categories_created_count,
+            'rejected': self.rejected_count,
+            'rejected_rows': self.rejected_rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(processed_count / elapsed),
+        }
+
+    def reject(self, line_number, errors):
+        self.rejected_count += 1
+        if len(self.rejected_rows) < MAX_REPORTED_REJECTIONS:
+            self.rejected_rows.append({'line': line_number, 'errors': errors})
+
+    def import_batch(self, batch):
+        rows = {}
+        for line_number, record in batch:
+            try:
+                row = clean_record(record)
+            except ValidationError as error:
+                self.reject(line_number, error.messages)
+                continue
+            # The last row wins when a slug repeats; ON CONFLICT cannot
+            # update the same product twice in one statement.
+            rows[row['slug']] = row
+
+        if not rows:
+            return
+
+        with transaction.atomic():
+            self.resolve_categories(rows.values())
+            previous_category_ids = dict(
+                models.Product.objects.filter(slug__in=rows)
+                .values_list('slug', 'category_id')
+            )
+            if connection.vendor == 'postgresql':
+                product_ids = self.upsert_with_copy(rows.values())
+            else:
+                product_ids = self.upsert_with_bulk_create(rows.values())
+
+            # Signals do not fire for either path, so derived data is
+            # refreshed once for the whole batch.
+            category_ids = set(previous_category_ids.values()) | {
+                self.category_ids[row['category']] for row in rows.values()
+            }
+            counters.reconcile_category_counters(
+                models.Category.objects.filter(pk__in=category_ids)
+            )
+            pricing.refresh_effective_prices(
+                models.Product.objects.filter(pk__in=product_ids)
+            )
+
+        cache.invalidate_catalog()
+        self.updated_count += len(previous_category_ids)
+        self.created_count += len(rows) - len(previous_category_ids)
+
+    def resolve_categories(self, rows):
+        titles = {row['category'] for row in rows} - self.category_ids.keys()
+        if not titles:
+            return
+
+        for pk, title in models.Category.objects.filter(title__in=titles) \
+                .order_by('-pk') \
+                .values_list('pk', 'title'):
+            self.category_ids[title] = pk
+
+        missing_titles = sorted(titles - self.category_ids.keys())
+        if missing_titles:
+            categories = models.Category.objects.bulk_create([
+                models.Category(title=title) for title in missing_titles
+            ])
+            if any(category.pk is None for category in categories):
+                categories = models.Category.objects.filter(title__in=missing_titles)
+            for category in categories:
+                self.category_ids[category.title] = category.pk
+            self.categories_created_count += len(missing_titles)
+
+    def upsert_with_copy(self, rows):
+        product_table = models.Product._meta.db_table
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'slug varchar(50), title varchar(255), description text, '
+                'price numeric(6, 2), stock integer, category_id bigint'
+                ') ON COMMIT DELETE ROWS'
+            )
+            with cursor.copy(
+                f'COPY {STAGING_TABLE} '
+                '(slug, title, description, price, stock, category_id) FROM STDIN'
+            ) as copy:
+                for row in rows:
+                    copy.write_row((
+                        row['slug'],
+                        row['title'],
+                        row['description'],
+                        row['price'],
+                        row['stock'],
+                        self.category_ids[row['category']],
+                    ))
+            # effective_price starts at the list price and is corrected for
+            # discounts by the caller.
+            cursor.execute(
+                f'INSERT INTO {product_table} ('
+                'slug, title, description, price, effective_price, stock, '
+                'category_id, created_at, updated_at, comments_count, '
+                'approved_comments_count, pending_comments_count, popularity'
+                ') '
+                'SELECT slug, title, description, price, price, stock, '
+                'category_id, %s, %s, 0, 0, 0, 0 '
+                f'FROM {STAGING_TABLE} '
+                'ON CONFLICT (slug) DO UPDATE SET '
+                'title = EXCLUDED.title, '
+                'description = EXCLUDED.description, '
+                'price = EXCLUDED.price, '
+                'stock = EXCLUDED.stock, '
+                'category_id = EXCLUDED.category_id, '
+                'updated_at = EXCLUDED.updated_at '
+                'RETURNING id',
+                [now, now]
+            )
+            return [product_id for product_id, in cursor.fetchall()]
+
+    def upsert_with_bulk_create(self, rows):
+        models.Product.objects.bulk_create(
+            [
+                models.Product(
+                    slug=row['slug'],
+                    title=row['title'],
+                    description=row['description'],
+                    price=row['price'],
+                    effective_price=row['price'],
+                    stock=row['stock'],
+                    category_id=self.category_ids[row['category']],
+                )
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=[
+                'title', 'description', 'price', 'stock', 'category', 'updated_at'
+            ]
+        )
+        return list(
+            models.Product.objects.filter(slug__in=[row['slug'] for row in rows])
+            .values_list('pk', flat=True)
+        )
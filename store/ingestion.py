@@ -0,0 +1,206 @@
+from collections import Counter
+from pathlib import Path
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, connections, transaction
+
+from store import cache
+from store import counters
+from store import models
+
+logger = logging.getLogger(__name__)
+
+SPOOL_FILE_PREFIX = 'comments-'
+DEAD_LETTER_FILE_PREFIX = 'dead-comments-'
+
+
+def write_comments(records):
+    comments = [models.Comment(**record) for record in records]
+    with transaction.atomic():
+        models.Comment.objects.bulk_create(comments)
+        # bulk_create does not send post_save, so counters are updated here.
+        created_counts = Counter(
+            (comment.product_id, comment.status) for comment in comments
+        )
+        for (product_id, status), count in created_counts.items():
+            counters.add_comments(product_id, status, count)
+    cache.invalidate_comment_feeds({record['product_id'] for record in records})
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CommentBuffer:
+    def __init__(self, spool_directory, max_items, max_delay):
+        self.spool_directory = Path(spool_directory)
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.pid = os.getpid()
+        self.spool_path = self.spool_directory / f'{SPOOL_FILE_PREFIX}{self.pid}.jsonl'
+        self.records = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, record):
+        with self.lock:
+            self.append_to_spool(record)
+            self.records.append(record)
+
+            if len(self.records) >= self.max_items:
+                self.flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if not self.records:
+            return
+
+        try:
+            write_comments(self.records)
+        except Exception:
+            logger.exception('Flushing %s buffered comments failed', len(self.records))
+            # One bad record must not hold back the batch forever, so the
+            # records are retried one by one.
+            self.records = self.write_individually(self.records)
+            if self.records:
+                # Records stay buffered and spooled; retry on the next tick.
+                self.rewrite_spool(self.records)
+                self.timer = threading.Timer(self.max_delay, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+                return
+
+        self.records = []
+        self.spool_path.unlink(missing_ok=True)
+
+    def write_individually(self, records):
+        for index, record in enumerate(records):
+            try:
+                write_comments([record])
+            except (IntegrityError, DataError, TypeError, ValueError):
+                # The record can never be written, e.g. its product was
+                # deleted while it was buffered.
+                logger.exception('Dead-lettering buffered comment %s', record)
+                self.dead_letter(record)
+            except Exception:
+                # Most likely the database is unavailable; the rest waits.
+                logger.exception('Writing buffered comment failed')
+                return records[index:]
+        return []
+
+    def dead_letter(self, record):
+        self.spool_directory.mkdir(parents=True, exist_ok=True)
+        dead_letter_path = self.spool_directory / f'{DEAD_LETTER_FILE_PREFIX}{self.pid}.jsonl'
+        with dead_letter_path.open('a') as dead_letters:
+            dead_letters.write(json.dumps(record) + '\n')
+
+    def rewrite_spool(self, records):
+        temporary_path = self.spool_path.with_suffix('.tmp')
+        with temporary_path.open('w') as spool:
+            for record in records:
+                spool.write(json.dumps(record) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(temporary_path, self.spool_path)
+
+    def append_to_spool(self, record):
+        self.spool_directory.mkdir(parents=True, exist_ok=True)
+        with self.spool_path.open('a') as spool:
+            spool.write(json.dumps(record) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+
+    def recover_spools(self):
+        if not self.spool_directory.exists():
+            return
+
+        with self.lock:
+            for spool_path in self.spool_directory.glob(f'{SPOOL_FILE_PREFIX}*.jsonl'):
+                owner_pid = int(spool_path.name[len(SPOOL_FILE_PREFIX):].split('.')[0])
+
+                if owner_pid != self.pid:
+                    if is_process_alive(owner_pid):
+                        continue
+
+                    # Claim the spool atomically so only one worker replays it.
+                    claimed_path = spool_path.with_name(
+                        f'{SPOOL_FILE_PREFIX}{self.pid}.{spool_path.name}'
+                    )
+                    try:
+                        spool_path.rename(claimed_path)
+                    except FileNotFoundError:
+                        continue
+                    spool_path = claimed_path
+
+                with spool_path.open() as spool:
+                    records = [json.loads(line) for line in spool if line.strip()]
+
+                if spool_path != self.spool_path:
+                    for record in records:
+                        self.append_to_spool(record)
+                    spool_path.unlink()
+
+                self.records.extend(records)
+                logger.info('Recovered %s spooled comments from %s', len(records), spool_path)
+
+            self.flush_locked()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_comment_buffer():
+    global _buffer
+
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            ingestion_settings = settings.COMMENT_INGESTION
+            _buffer = CommentBuffer(
+                spool_directory=ingestion_settings['SPOOL_DIRECTORY'],
+                max_items=ingestion_settings['MAX_ITEMS'],
+                max_delay=ingestion_settings['MAX_DELAY_MS'] / 1000,
+            )
+            _buffer.recover_spools()
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def is_buffered():
+    return settings.COMMENT_INGESTION['MODE'] == 'buffered'
+
+
+def enqueue_comment(product_id, validated_data):
+    get_comment_buffer().add({
+        'product_id': product_id,
+        'name': validated_data['name'],
+        'body': validated_data['body'],
+    })
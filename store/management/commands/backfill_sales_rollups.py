@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from store import models
+from store import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollups from order history in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--since',
+            help='Only rebuild days from this date (YYYY-MM-DD) on'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+
+        orders = models.Order.objects.order_by('pk')
+        if since is not None:
+            orders = orders.filter(created_at__date__gte=since)
+
+        # Orders created after this point are added by the live path.
+        last_pk = orders.values_list('pk', flat=True).last()
+        if last_pk is None:
+            self.stdout.write('No orders to process.')
+            return
+
+        # Each chunk commits on its own to keep locks short, so status
+        # changes made while this runs may be counted twice; run it when
+        # staff are not editing orders.
+        with transaction.atomic():
+            for model, _ in rollups.ROLLUPS:
+                rows = model.objects.all()
+                if since is not None:
+                    rows = rows.filter(day__gte=since)
+                rows._raw_delete(rows.db)
+
+        processed_count = 0
+        started = time.monotonic()
+        cursor_pk = 0
+        while True:
+            order_ids = list(
+                orders.filter(pk__gt=cursor_pk, pk__lte=last_pk)
+                .values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not order_ids:
+                break
+
+            with transaction.atomic():
+                rollups.add_order_sales(order_ids)
+            cursor_pk = order_ids[-1]
+            processed_count += len(order_ids)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'Processed {processed_count} orders '
+                f'({processed_count / elapsed:.0f} orders/sec), last order id={cursor_pk}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {processed_count} orders'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import cache
+from store import popularity
+
+
+class Command(BaseCommand):
+    help = 'Recomputes time-decayed product popularity (run periodically, e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life-days', type=float)
+        parser.add_argument('--window-days', type=int)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scores = popularity.compute_scores(
+            options['half_life_days'],
+            options['window_days']
+        )
+        updated_count = popularity.save_scores(scores, options['batch_size'])
+        if updated_count:
+            cache.invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {len(scores)} products, updated {updated_count} '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Folds orders placed since the last run into the co-purchase counts '
+        'and refreshes the affected frequently-bought-together lists'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--top-k', type=int)
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the counts and recompute them from every order'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            recommendations.reset_recommendations()
+
+        started = time.monotonic()
+
+        def progress(processed_count, last_order_id):
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'Processed {processed_count} orders '
+                f'({processed_count / elapsed:.0f} orders/sec), last order id={last_order_id}'
+            )
+
+        processed_count = recommendations.update_recommendations(
+            options['chunk_size'],
+            options['top_k'],
+            progress
+        )
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed_count} new orders'))
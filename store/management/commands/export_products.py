@@ -0,0 +1,69 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import compression
+from store import exports
+
+
+class Command(BaseCommand):
+    help = 'Streams the product catalog as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--export-format',
+            choices=list(exports.EXPORT_FORMATS),
+            default='csv'
+        )
+        parser.add_argument(
+            '--since',
+            help='Only export products updated at or after this timestamp'
+        )
+        parser.add_argument('--description', action='store_true')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since is not None:
+            try:
+                since = exports.parse_since(since)
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        started_at = timezone.now()
+        fields = exports.get_export_fields(options['description'])
+        rows = exports.get_export_rows(fields, since, options['chunk_size'])
+
+        exported_count = 0
+
+        def count_rows(rows):
+            nonlocal exported_count
+            for row in rows:
+                exported_count += 1
+                yield row
+
+        chunks = exports.iter_batched(
+            exports.iter_export(options['export_format'], fields, count_rows(rows))
+        )
+        if options['gzip']:
+            chunks = compression.iter_compressed(chunks, 'gzip')
+
+        started = time.monotonic()
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(
+            f'Exported {exported_count} products in {elapsed:.1f}s '
+            f'({exported_count / elapsed:.0f} rows/sec). '
+            f'Use --since {started_at.isoformat()} for the next incremental export.'
+        )
@@ -0,0 +1,47 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import imports
+
+
+class Command(BaseCommand):
+    help = 'Creates or updates products by slug from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for stdin')
+        parser.add_argument(
+            '--import-format',
+            choices=imports.IMPORT_FORMATS,
+            help='Defaults to the file extension'
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format'] or path.rsplit('.', 1)[-1].lower()
+        if import_format not in imports.IMPORT_FORMATS:
+            raise CommandError('Pass --import-format for files without a csv or jsonl extension.')
+
+        importer = imports.ProductImporter(options['batch_size'])
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+            report = importer.import_stream(stream, import_format)
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                report = importer.import_stream(stream, import_format)
+
+        for rejected_row in report['rejected_rows']:
+            self.stderr.write(f'Line {rejected_row["line"]}: {" ".join(rejected_row["errors"])}')
+        if report['rejected'] > len(report['rejected_rows']):
+            self.stderr.write(
+                f'... {report["rejected"] - len(report["rejected_rows"])} more rejected rows'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report["created"]} and updated {report["updated"]} products, '
+            f'created {report["categories_created"]} categories, '
+            f'rejected {report["rejected"]} rows in {report["seconds"]:.1f}s '
+            f'({report["rows_per_second"]} rows/sec)'
+        ))
@@ -0,0 +1,108 @@
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from store import models
+from store.sharding import get_cart_shards
+
+
+class Command(BaseCommand):
+    help = 'Deletes carts without recent activity in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--ttl-days',
+            type=float,
+            help='Overrides the CART_TTL setting'
+        )
+        parser.add_argument(
+            '--start-after',
+            help='Resume after this cart id (printed with every batch)'
+        )
+        parser.add_argument(
+            '--database',
+            action='append',
+            help='Only purge this cart shard (defaults to every CART_SHARDS alias)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ttl = (
+            timedelta(days=options['ttl_days'])
+            if options['ttl_days'] is not None
+            else settings.CART_TTL
+        )
+        expired_before = timezone.now() - ttl
+
+        carts_deleted = 0
+        items_deleted = 0
+        started = time.monotonic()
+
+        self.stdout.write(f'Purging carts inactive since {expired_before:%Y-%m-%d %H:%M:%S}...')
+        for alias in options['database'] or get_cart_shards():
+            last_pk = options['start_after']
+            while True:
+                batch_started = time.monotonic()
+                pks, batch_items, batch_carts = self.purge_batch(
+                    alias,
+                    expired_before,
+                    last_pk,
+                    batch_size
+                )
+                if not pks:
+                    break
+
+                last_pk = pks[-1]
+                carts_deleted += batch_carts
+                items_deleted += batch_items
+                elapsed = time.monotonic() - batch_started
+                self.stdout.write(
+                    f'[{alias}] Deleted {batch_carts} carts and {batch_items} items '
+                    f'({(batch_carts + batch_items) / elapsed:.0f} rows/sec), '
+                    f'last cart id={last_pk}'
+                )
+
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {carts_deleted} carts and {items_deleted} items in '
+            f'{elapsed:.1f}s ({(carts_deleted + items_deleted) / elapsed:.0f} rows/sec)'
+        ))
+
+    def purge_batch(self, alias, expired_before, last_pk, batch_size):
+        queryset = models.Cart.objects.using(alias).filter(updated_at__lt=expired_before)
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+
+        connection = connections[queryset.db]
+        skip_locked = connection.features.has_select_for_update_skip_locked
+
+        with transaction.atomic(using=queryset.db):
+            # Carts locked by live requests are skipped and left for a later run.
+            if skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return pks, 0, 0
+
+            # Raw deletes skip the collector and per-item signals; the carts
+            # are removed whole, so no totals need refreshing.
+            items_deleted = models.CartItem.objects.filter(cart_id__in=pks) \
+                ._raw_delete(queryset.db)
+            carts_deleted = models.Cart.objects.filter(pk__in=pks) \
+                ._raw_delete(queryset.db)
+
+        return pks, items_deleted, carts_deleted
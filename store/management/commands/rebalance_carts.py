@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store import models
+from store.sharding import get_cart_shard, get_cart_shards
+
+
+class Command(BaseCommand):
+    help = 'Moves carts to the shard their id hashes to after CART_SHARDS changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--drain',
+            action='append',
+            default=[],
+            help='Also move every cart off this database alias (removed shards)'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        aliases = get_cart_shards() + [
+            alias for alias in options['drain'] if alias not in get_cart_shards()
+        ]
+
+        moved_count = 0
+        for alias in aliases:
+            last_pk = None
+            while True:
+                queryset = models.Cart.objects.using(alias).order_by('pk')
+                if last_pk is not None:
+                    queryset = queryset.filter(pk__gt=last_pk)
+                pks = list(queryset.values_list('pk', flat=True)[:options['batch_size']])
+                if not pks:
+                    break
+                last_pk = pks[-1]
+
+                misplaced = defaultdict(list)
+                for pk in pks:
+                    target = get_cart_shard(pk)
+                    if target != alias:
+                        misplaced[target].append(pk)
+
+                for target, cart_ids in misplaced.items():
+                    if not options['dry_run']:
+                        self.move_carts(alias, target, cart_ids)
+                    moved_count += len(cart_ids)
+                    self.stdout.write(f'{alias} -> {target}: {len(cart_ids)} carts')
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved_count} carts'))
+
+    def move_carts(self, source, target, cart_ids):
+        # The target commits first; if the source delete then fails, the next
+        # run finds the carts on both shards and only removes the stale copy.
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            carts = list(
+                models.Cart.objects.using(source)
+                .select_for_update()
+                .filter(pk__in=cart_ids)
+            )
+            existing_ids = set(
+                models.Cart.objects.using(target)
+                .filter(pk__in=cart_ids)
+                .values_list('pk', flat=True)
+            )
+            # Carts already written on the target by live traffic win.
+            new_ids = [cart.pk for cart in carts if cart.pk not in existing_ids]
+            items = list(models.CartItem.objects.using(source).filter(cart_id__in=new_ids))
+            for item in items:
+                # Item ids come from per-shard sequences and may collide.
+                item.pk = None
+
+            new_carts = [cart for cart in carts if cart.pk in new_ids]
+            updated_ats = [cart.updated_at for cart in new_carts]
+            models.Cart.objects.using(target).bulk_create(new_carts)
+            # bulk_create stamps updated_at with the time of the move, which
+            # would keep abandoned carts from being purged.
+            for cart, updated_at in zip(new_carts, updated_ats):
+                cart.updated_at = updated_at
+            models.Cart.objects.using(target).bulk_update(new_carts, ['updated_at'])
+            models.CartItem.objects.using(target).bulk_create(items)
+
+            models.CartItem.objects.using(source).filter(cart_id__in=cart_ids) \
+                ._raw_delete(source)
+            models.Cart.objects.using(source).filter(pk__in=cart_ids) \
+                ._raw_delete(source)
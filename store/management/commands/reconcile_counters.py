@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from store import counters
+from store import models
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized comment and product counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        fixed_products = self.reconcile(
+            models.Product,
+            counters.reconcile_product_counters,
+            batch_size
+        )
+        self.stdout.write(f'{fixed_products} product counters fixed')
+
+        fixed_categories = self.reconcile(
+            models.Category,
+            counters.reconcile_category_counters,
+            batch_size
+        )
+        self.stdout.write(f'{fixed_categories} category counters fixed')
+
+    def reconcile(self, model, reconcile_batch, batch_size):
+        fixed = 0
+        last_pk = 0
+        while True:
+            batch_pks = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_pks:
+                return fixed
+
+            fixed += reconcile_batch(
+                model.objects.filter(pk__gte=batch_pks[0], pk__lte=batch_pks[-1])
+            )
+            last_pk = batch_pks[-1]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:38
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def populate_counters(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+    Comment = apps.get_model('store', 'Comment')
+
+    comments = Comment.objects.filter(product_id=OuterRef('pk'))
+    Product.objects.update(
+        comments_count=count_subquery(comments, 'product_id'),
+        approved_comments_count=count_subquery(
+            comments.filter(status='approved'),
+            'product_id'
+        ),
+        pending_comments_count=count_subquery(
+            comments.filter(status='pending'),
+            'product_id'
+        ),
+    )
+    Category.objects.update(
+        products_count=count_subquery(
+            Product.objects.filter(category_id=OuterRef('pk')),
+            'category_id'
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_comment_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='approved_comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='pending_comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
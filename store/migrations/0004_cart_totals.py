@@ -0,0 +1,55 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:39
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+
+    items = CartItem.objects.filter(cart_id=OuterRef('pk')) \
+        .order_by() \
+        .values('cart_id')
+    Cart.objects.update(
+        subtotal=Coalesce(
+            Subquery(
+                items.annotate(
+                    subtotal=Sum(F('quantity') * F('product__price'))
+                ).values('subtotal')
+            ),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ),
+        items_count=Coalesce(
+            Subquery(
+                items.annotate(items_count=Sum('quantity')).values('items_count')
+            ),
+            Value(0),
+            output_field=IntegerField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(populate_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:41
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def populate_updated_at(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    Cart.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_updated_at, migrations.RunPython.noop),
+    ]
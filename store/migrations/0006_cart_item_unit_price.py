@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:43
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def populate_unit_prices(apps, schema_editor):
+    CartItem = apps.get_model('store', 'CartItem')
+    Product = apps.get_model('store', 'Product')
+
+    CartItem.objects.filter(
+        product_id__in=Product.objects.values('pk')
+    ).update(
+        unit_price=Subquery(
+            Product.objects.filter(pk=OuterRef('product_id')).values('price')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='store.product'),
+        ),
+        migrations.RunPython(populate_unit_prices, migrations.RunPython.noop),
+    ]
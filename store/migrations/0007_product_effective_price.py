@@ -0,0 +1,70 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:52
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Round
+
+
+def populate_effective_prices(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    CartItem = apps.get_model('store', 'CartItem')
+    Cart = apps.get_model('store', 'Cart')
+
+    best_discount = Subquery(
+        Product.discounts.through.objects
+        .filter(product_id=OuterRef('pk'))
+        .order_by()
+        .values('product_id')
+        .annotate(best_discount=Max('discount__discount'))
+        .values('best_discount')
+    )
+    discount = Cast(
+        Least(Greatest(Coalesce(best_discount, Value(0.0)), Value(0.0)), Value(1.0)),
+        models.DecimalField(max_digits=5, decimal_places=4)
+    )
+    Product.objects.update(
+        effective_price=Round(
+            F('price') * (Value(Decimal(1)) - discount),
+            2,
+            output_field=models.DecimalField(max_digits=6, decimal_places=2)
+        )
+    )
+    CartItem.objects.filter(
+        product_id__in=Product.objects.values('pk')
+    ).update(
+        unit_price=Subquery(
+            Product.objects.filter(pk=OuterRef('product_id')).values('effective_price')
+        )
+    )
+    Cart.objects.update(
+        subtotal=Coalesce(
+            Subquery(
+                CartItem.objects.filter(cart_id=OuterRef('pk'))
+                .order_by()
+                .values('cart_id')
+                .annotate(subtotal=Sum(F('quantity') * F('unit_price')))
+                .values('subtotal')
+            ),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_cart_item_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=6),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_effective_prices, migrations.RunPython.noop),
+    ]
@@ -5,9 +5,38 @@ from django.core.validators import MinValueValidator
 from django.db import models
 
 
-class Category(models.Model):
+class MaintainedFieldsModel(models.Model):
+    # Columns written only by bulk updates elsewhere (counters, scores). A
+    # full save of a loaded instance leaves them out instead of writing back
+    # the possibly stale values it holds.
+    maintained_fields = []
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and not force_insert and not self._state.adding:
+            deferred_fields = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+                and field.attname not in deferred_fields
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields
+        )
+
+
+class Category(MaintainedFieldsModel):
+    maintained_fields = ['products_count']
+
     title = models.CharField(max_length=255)
     description = models.CharField(max_length=500, blank=True)
+    products_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = 'categories'
@@ -24,20 +53,52 @@ class Discount(models.Model):
         return f'{str(self.discount)} | {self.description}'
 
 
-class Product(models.Model):
+class Product(MaintainedFieldsModel):
+    maintained_fields = [
+        'comments_count',
+        'approved_comments_count',
+        'pending_comments_count',
+        'popularity',
+    ]
+
     title = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    # Price after the best of the product's discounts, kept up to date by
+    # store.pricing.
+    effective_price = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        editable=False,
+        db_index=True
+    )
     stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     category = models.ForeignKey(
         Category,
         on_delete=models.PROTECT,
         related_name='products'
     )
     discounts = models.ManyToManyField(Discount, blank=True)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    approved_comments_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed sales and cart activity, recomputed by compute_popularity
+    popularity = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-id'],
+                name='product_popularity_idx'
+            ),
+            models.Index(
+                fields=['category', '-popularity', '-id'],
+                name='category_popularity_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -80,6 +141,14 @@ class Comment(models.Model):
     objects = CommentManager()
     approved = ApprovedCommentManager()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product', 'status', '-created_at', '-id'],
+                name='comment_feed_idx'
+            )
+        ]
+
 
 class Customer(models.Model):
     user = models.OneToOneField(
@@ -111,6 +180,14 @@ class Address(models.Model):
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    subtotal = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+    items_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f'Cart id={self.id}'
@@ -118,15 +195,23 @@ class Cart(models.Model):
 
 class CartItem(models.Model):
     quantity = models.PositiveSmallIntegerField()
+    unit_price = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
     cart = models.ForeignKey(
         Cart,
         on_delete=models.CASCADE,
         related_name='items'
     )
+    # Carts may live on a shard without the products table.
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
-        related_name='cart_items'
+        related_name='cart_items',
+        db_constraint=False
     )
 
     class Meta:
@@ -171,6 +256,20 @@ class Order(models.Model):
     objects = models.Manager()
     unpaid = UnpaidOrderManager()
 
+    class Meta:
+        indexes = [
+            # Order history pages walk (created_at, id) per customer,
+            # optionally filtered by status.
+            models.Index(
+                fields=['customer', '-created_at', '-id'],
+                name='order_history_idx'
+            ),
+            models.Index(
+                fields=['customer', 'status', '-created_at', '-id'],
+                name='order_history_status_idx'
+            ),
+        ]
+
     def __str__(self):
         return f'Order id={self.id}'
 
@@ -196,3 +295,119 @@ class OrderItem(models.Model):
                 name='unique_order_item'
             )
         ]
+
+
+class DailySales(models.Model):
+    day = models.DateField()
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status'],
+                name='unique_daily_sales'
+            )
+        ]
+
+
+class DailyCategorySales(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily category sales'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'category', 'status'],
+                name='unique_daily_category_sales'
+            )
+        ]
+
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily product sales'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'product', 'status'],
+                name='unique_daily_product_sales'
+            )
+        ]
+
+
+class ProductPairCount(models.Model):
+    # Sparse product x product co-purchase matrix; both directions are stored.
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    other_product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'other_product'],
+                name='unique_product_pair_count'
+            )
+        ]
+
+
+class ProductRecommendation(models.Model):
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    recommended_product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'rank'],
+                name='unique_product_recommendation_rank'
+            )
+        ]
+
+
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} at {self.last_id}'
@@ -0,0 +1,70 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store import models
+from store.sharding import get_cart_shards
+
+
+def get_decay(day, today, half_life_days):
+    return 0.5 ** ((today - day).days / half_life_days)
+
+
+def add_activity(scores, rows, weight, today, half_life_days):
+    for product_id, day, quantity in rows:
+        scores[product_id] += weight * quantity * get_decay(day, today, half_life_days)
+
+
+def compute_scores(half_life_days=None, window_days=None):
+    options = settings.POPULARITY
+    half_life_days = half_life_days or options['HALF_LIFE_DAYS']
+    window_days = window_days or options['WINDOW_DAYS']
+    now = timezone.now()
+    today = timezone.localdate(now)
+    since = now - timedelta(days=window_days)
+
+    # Activity is summed per product and day in SQL; only the decay is
+    # applied in Python, over at most products x days rows.
+    scores = defaultdict(float)
+    add_activity(
+        scores,
+        models.OrderItem.objects.filter(order__created_at__gte=since)
+        .exclude(order__status=models.Order.STATUS_CANCELED)
+        .values_list('product_id', TruncDate('order__created_at'))
+        .annotate(quantity=Sum('quantity'))
+        .order_by(),
+        options['ORDER_WEIGHT'],
+        today,
+        half_life_days
+    )
+    for alias in get_cart_shards():
+        add_activity(
+            scores,
+            models.CartItem.objects.using(alias)
+            .filter(cart__updated_at__gte=since)
+            .values_list('product_id', TruncDate('cart__updated_at'))
+            .annotate(quantity=Sum('quantity'))
+            .order_by(),
+            options['CART_WEIGHT'],
+            today,
+            half_life_days
+        )
+    return scores
+
+
+def save_scores(scores, batch_size=1000):
+    scores = {pk: round(score, 4) for pk, score in scores.items()}
+    # Products that dropped out of the window decay to zero.
+    changed_products = [
+        models.Product(pk=pk, popularity=scores.get(pk, 0))
+        for pk, popularity in models.Product.objects
+        .values_list('pk', 'popularity')
+        .iterator(chunk_size=batch_size)
+        if popularity != scores.get(pk, 0)
+    ]
+    models.Product.objects.bulk_update(changed_products, ['popularity'], batch_size=batch_size)
+    return len(changed_products)
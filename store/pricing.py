@@ -0,0 +1,52 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Now, Round
+
+from store import cache
+from store import carts
+from store import models
+
+CENT = Decimal('0.01')
+DISCOUNT_PRECISION = Decimal('0.0001')
+
+
+def apply_discount(price, discount):
+    discount = Decimal(str(min(max(discount or 0, 0), 1))).quantize(DISCOUNT_PRECISION)
+    return (Decimal(price) * (1 - discount)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def get_effective_price():
+    # The best discount wins; discounts are fractions of the price.
+    best_discount = Subquery(
+        models.Product.discounts.through.objects
+        .filter(product_id=OuterRef('pk'))
+        .order_by()
+        .values('product_id')
+        .annotate(best_discount=Max('discount__discount'))
+        .values('best_discount')
+    )
+    discount = Cast(
+        Least(Greatest(Coalesce(best_discount, Value(0.0)), Value(0.0)), Value(1.0)),
+        DecimalField(max_digits=5, decimal_places=4)
+    )
+    return Round(
+        F('price') * (Value(Decimal(1)) - discount),
+        2,
+        output_field=DecimalField(max_digits=6, decimal_places=2)
+    )
+
+
+def refresh_effective_prices(queryset):
+    effective_price = get_effective_price()
+    changed_pks = list(
+        queryset.annotate(actual_effective_price=effective_price)
+        .exclude(effective_price=F('actual_effective_price'))
+        .values_list('pk', flat=True)
+    )
+    if changed_pks:
+        models.Product.objects.filter(pk__in=changed_pks) \
+            .update(effective_price=effective_price, updated_at=Now())
+        carts.refresh_carts_for_products(changed_pks)
+        cache.invalidate_catalog()
+    return changed_pks
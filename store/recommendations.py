@@ -0,0 +1,198 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import reduce
+import operator
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from store import models
+
+CHECKPOINT_NAME = 'product-recommendations'
+
+
+def get_checkpoint():
+    checkpoint, _ = models.JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    return checkpoint
+
+
+def get_last_settled_order_id(settle_delay):
+    # Orders commit out of id order; recent ones are left for the next
+    # run so a late commit below the checkpoint is never skipped.
+    return models.Order.objects \
+        .filter(created_at__lt=timezone.now() - settle_delay) \
+        .order_by('-pk') \
+        .values_list('pk', flat=True) \
+        .first() or 0
+
+
+def add_pair_counts(first_order_id, last_order_id):
+    pair_table = models.ProductPairCount._meta.db_table
+    item_table = models.OrderItem._meta.db_table
+    order_table = models.Order._meta.db_table
+    with connection.cursor() as cursor:
+        # The self-join yields every ordered pair of products bought in
+        # the same order; the grouped counts are added to the matrix.
+        cursor.execute(
+            f'INSERT INTO {pair_table} (product_id, other_product_id, count) '
+            f'SELECT item.product_id, other_item.product_id, COUNT(*) '
+            f'FROM {item_table} item '
+            f'JOIN {item_table} other_item '
+            f'ON other_item.order_id = item.order_id '
+            f'AND other_item.product_id <> item.product_id '
+            f'JOIN {order_table} o ON o.id = item.order_id '
+            f'WHERE item.order_id >= %s AND item.order_id <= %s AND o.status <> %s '
+            f'GROUP BY item.product_id, other_item.product_id '
+            f'ON CONFLICT (product_id, other_product_id) '
+            f'DO UPDATE SET count = {pair_table}.count + EXCLUDED.count',
+            [first_order_id, last_order_id, models.Order.STATUS_CANCELED]
+        )
+        cursor.execute(
+            f'SELECT DISTINCT product_id FROM {item_table} '
+            f'WHERE order_id >= %s AND order_id <= %s',
+            [first_order_id, last_order_id]
+        )
+        return [product_id for product_id, in cursor.fetchall()]
+
+
+def get_order_pairs(order_ids):
+    # The pairs the job has counted for these orders: those up to its
+    # checkpoint that are not canceled. Locking the checkpoint keeps the job
+    # from counting the orders while they change.
+    checkpoint = models.JobCheckpoint.objects.select_for_update() \
+        .get(pk=get_checkpoint().pk)
+    items = models.OrderItem.objects \
+        .filter(order_id__in=order_ids, order_id__lte=checkpoint.last_id) \
+        .exclude(order__status=models.Order.STATUS_CANCELED) \
+        .order_by() \
+        .values_list('order_id', 'product_id')
+
+    order_products = defaultdict(set)
+    for order_id, product_id in items:
+        order_products[order_id].add(product_id)
+    pairs = Counter()
+    for product_ids in order_products.values():
+        pairs.update(
+            (product_id, other_product_id)
+            for product_id in product_ids
+            for other_product_id in product_ids
+            if other_product_id != product_id
+        )
+    return pairs
+
+
+def apply_pair_deltas(deltas):
+    pair_table = models.ProductPairCount._meta.db_table
+    pairs_by_delta = defaultdict(list)
+    for pair, delta in deltas.items():
+        pairs_by_delta[delta].append(pair)
+
+    for delta, pairs in pairs_by_delta.items():
+        if delta > 0:
+            placeholders = ', '.join(['(%s, %s, %s)'] * len(pairs))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {pair_table} (product_id, other_product_id, count) '
+                    f'VALUES {placeholders} '
+                    f'ON CONFLICT (product_id, other_product_id) '
+                    f'DO UPDATE SET count = {pair_table}.count + EXCLUDED.count',
+                    [value for pair in pairs for value in (*pair, delta)]
+                )
+        else:
+            # Removed pairs were counted before, so their rows exist.
+            models.ProductPairCount.objects.filter(reduce(operator.or_, [
+                Q(product_id=product_id, other_product_id=other_product_id)
+                for product_id, other_product_id in pairs
+            ])).update(count=F('count') + delta)
+
+
+def update_order_pairs(order_ids, previous_pairs):
+    current_pairs = get_order_pairs(order_ids)
+    deltas = {
+        pair: current_pairs[pair] - previous_pairs[pair]
+        for pair in previous_pairs.keys() | current_pairs.keys()
+        if current_pairs[pair] != previous_pairs[pair]
+    }
+    if not deltas:
+        return
+
+    apply_pair_deltas(deltas)
+    product_ids = sorted({product_id for product_id, _ in deltas})
+    for start in range(0, len(product_ids), 500):
+        refresh_recommendations(
+            product_ids[start:start + 500],
+            settings.RECOMMENDATIONS['TOP_K']
+        )
+
+
+@contextmanager
+def refreshing_order_pairs(order_ids):
+    # Wraps changes to orders the job may have counted already, such as a
+    # cancellation; their pairs are corrected by the difference.
+    with transaction.atomic():
+        previous_pairs = get_order_pairs(order_ids)
+        yield
+        update_order_pairs(order_ids, previous_pairs)
+
+
+def refresh_recommendations(product_ids, top_k):
+    recommendation_table = models.ProductRecommendation._meta.db_table
+    pair_table = models.ProductPairCount._meta.db_table
+    models.ProductRecommendation.objects.filter(product_id__in=product_ids).delete()
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {recommendation_table} '
+            f'(product_id, recommended_product_id, score, rank) '
+            f'SELECT product_id, other_product_id, count, pair_rank FROM ('
+            f'SELECT product_id, other_product_id, count, ROW_NUMBER() OVER ('
+            f'PARTITION BY product_id ORDER BY count DESC, other_product_id'
+            f') AS pair_rank FROM {pair_table} WHERE product_id IN ({placeholders})'
+            f') ranked WHERE pair_rank <= %s',
+            [*product_ids, top_k]
+        )
+
+
+def update_recommendations(chunk_size=None, top_k=None, progress=None):
+    options = settings.RECOMMENDATIONS
+    chunk_size = chunk_size or options['CHUNK_SIZE']
+    top_k = top_k or options['TOP_K']
+    last_order_id = get_last_settled_order_id(timedelta(seconds=options['SETTLE_SECONDS']))
+
+    processed_count = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = models.JobCheckpoint.objects.select_for_update() \
+                .get(pk=get_checkpoint().pk)
+            order_ids = list(
+                models.Order.objects
+                .filter(pk__gt=checkpoint.last_id, pk__lte=last_order_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not order_ids:
+                break
+
+            product_ids = add_pair_counts(order_ids[0], order_ids[-1])
+            # The top K of a product changes only when one of its own pairs does.
+            for start in range(0, len(product_ids), 500):
+                refresh_recommendations(product_ids[start:start + 500], top_k)
+
+            checkpoint.last_id = order_ids[-1]
+            checkpoint.save()
+
+        processed_count += len(order_ids)
+        if progress is not None:
+            progress(processed_count, order_ids[-1])
+    return processed_count
+
+
+def reset_recommendations():
+    with transaction.atomic():
+        for model in [models.ProductRecommendation, models.ProductPairCount]:
+            queryset = model.objects.all()
+            queryset._raw_delete(queryset.db)
+        models.JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).update(last_id=0)
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from store import models
+from store import recommendations
+
+ROLLUPS = [
+    (models.DailySales, ['day', 'status']),
+    (models.DailyCategorySales, ['day', 'category_id', 'status']),
+    (models.DailyProductSales, ['day', 'product_id', 'status']),
+]
+METRICS = ['revenue', 'units', 'orders_count']
+
+
+def get_order_sales(order_ids):
+    # One row per order item; every rollup level is folded from it.
+    items = models.OrderItem.objects.filter(order_id__in=order_ids) \
+        .order_by() \
+        .values_list(
+            'order_id',
+            TruncDate('order__created_at'),
+            'order__status',
+            'product_id',
+            'product__category_id',
+            'quantity',
+            'price'
+        )
+
+    totals = {model: defaultdict(lambda: [Decimal(0), 0, set()]) for model, _ in ROLLUPS}
+    for order_id, day, status, product_id, category_id, quantity, price in items:
+        keys = {
+            models.DailySales: (day, status),
+            models.DailyCategorySales: (day, category_id, status),
+            models.DailyProductSales: (day, product_id, status),
+        }
+        for model, key in keys.items():
+            total = totals[model][key]
+            total[0] += quantity * price
+            total[1] += quantity
+            total[2].add(order_id)
+
+    return {
+        model: {
+            key: (revenue, units, len(order_ids))
+            for key, (revenue, units, order_ids) in model_totals.items()
+        }
+        for model, model_totals in totals.items()
+    }
+
+
+def get_sales_deltas(previous_sales, current_sales):
+    deltas = {}
+    for model, _ in ROLLUPS:
+        model_deltas = []
+        previous = previous_sales.get(model, {})
+        current = current_sales.get(model, {})
+        for key in previous.keys() | current.keys():
+            delta = [
+                current_metric - previous_metric
+                for previous_metric, current_metric in zip(
+                    previous.get(key, (0, 0, 0)),
+                    current.get(key, (0, 0, 0))
+                )
+            ]
+            if any(delta):
+                model_deltas.append((*key, *delta))
+        deltas[model] = model_deltas
+    return deltas
+
+
+def apply_sales_deltas(deltas):
+    with connection.cursor() as cursor:
+        for model, key_fields in ROLLUPS:
+            rows = deltas.get(model)
+            if not rows:
+                continue
+
+            table = connection.ops.quote_name(model._meta.db_table)
+            columns = key_fields + METRICS
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+            updates = ', '.join(
+                f'{metric} = {table}.{metric} + EXCLUDED.{metric}' for metric in METRICS
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES {placeholders} '
+                f'ON CONFLICT ({", ".join(key_fields)}) DO UPDATE SET {updates}',
+                [value for row in rows for value in row]
+            )
+
+
+def update_order_sales(order_ids, previous_sales):
+    apply_sales_deltas(get_sales_deltas(previous_sales, get_order_sales(order_ids)))
+
+
+def add_order_sales(order_ids):
+    update_order_sales(order_ids, {})
+
+
+@contextmanager
+def refreshing_order_sales(order_ids):
+    # Wraps changes to orders or their items; the rollups receive the
+    # difference between the orders' sales before and after.
+    with transaction.atomic():
+        order_ids = list(
+            models.Order.objects.select_for_update()
+            .filter(pk__in=order_ids)
+            .values_list('pk', flat=True)
+        )
+        previous_sales = get_order_sales(order_ids)
+        with recommendations.refreshing_order_pairs(order_ids):
+            yield
+        update_order_sales(order_ids, previous_sales)
+
+
+def set_order_status(queryset, status):
+    order_ids = list(queryset.values_list('pk', flat=True))
+    with refreshing_order_sales(order_ids):
+        return models.Order.objects.filter(pk__in=order_ids).update(status=status)
+
+
+def get_sales_report(group_by, queryset_filters):
+    model, group_fields = {
+        'day': (models.DailySales, ['day']),
+        'category': (models.DailyCategorySales, ['category_id', 'category__title']),
+        'product': (models.DailyProductSales, ['product_id', 'product__title']),
+    }[group_by]
+    return model.objects.filter(**queryset_filters) \
+        .values(*group_fields) \
+        .annotate(
+            revenue=Sum('revenue'),
+            units=Sum('units'),
+            orders_count=Sum('orders_count')
+        ) \
+        .filter(orders_count__gt=0) \
+        .order_by(*(['day'] if group_by == 'day' else ['-revenue', group_fields[0]]))
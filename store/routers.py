@@ -0,0 +1,33 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from store import models
+from store.sharding import get_cart_shard
+
+CART_MODELS = (models.Cart, models.CartItem)
+
+
+def get_instance_cart_id(instance):
+    if isinstance(instance, models.Cart):
+        return instance.pk
+    if isinstance(instance, models.CartItem):
+        return instance.cart_id
+    return None
+
+
+class CartShardRouter:
+    def db_for_read(self, model, **hints):
+        cart_id = get_instance_cart_id(hints.get('instance'))
+        if cart_id is None:
+            return None
+        if issubclass(model, CART_MODELS):
+            return get_cart_shard(cart_id)
+        # Everything a cart points to (products) lives on the primary.
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if isinstance(obj1, CART_MODELS) or isinstance(obj2, CART_MODELS):
+            return True
+        return None
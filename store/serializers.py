@@ -2,53 +2,91 @@ from decimal import Decimal
 
 from django.db import transaction
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 
 from store import models
+from store import rollups
+from store.cart_storage import get_cart_storage
 
 PRODUCT_PRICE_TAX = 0.09
 
 
+class SparseFieldsetMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Views pass the fields requested with ?fields= in the context.
+        fields = self.context.get('fields')
+        if fields is not None:
+            for field_name in set(self.fields) - fields:
+                self.fields.pop(field_name)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Category
         fields = ['pk', 'title']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     price_after_tax = serializers.SerializerMethodField()
     category = CategorySerializer()
+    comments_count = serializers.IntegerField(
+        source='approved_comments_count',
+        read_only=True
+    )
 
     class Meta:
         model = models.Product
         fields = [
-            'pk', 'title', 'price',
-            'price_after_tax', 'category'
+            'pk', 'title', 'price', 'effective_price',
+            'price_after_tax', 'category', 'comments_count'
         ]
 
     def get_price_after_tax(self, product):
         return round(
-            product.price * Decimal(1 + PRODUCT_PRICE_TAX),
+            product.effective_price * Decimal(1 + PRODUCT_PRICE_TAX),
             ndigits=2
         )
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class RecommendedProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Product
+        fields = ['pk', 'title', 'slug', 'effective_price']
+
+
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     price_after_tax = serializers.SerializerMethodField()
     category = CategorySerializer()
+    comments_count = serializers.IntegerField(
+        source='approved_comments_count',
+        read_only=True
+    )
+    frequently_bought_together = serializers.SerializerMethodField()
 
     class Meta:
         model = models.Product
         fields = [
-            'pk', 'title', 'description', 'price',
-            'price_after_tax', 'category'
+            'pk', 'title', 'description', 'price', 'effective_price',
+            'price_after_tax', 'category', 'comments_count',
+            'frequently_bought_together'
         ]
 
     def get_price_after_tax(self, product):
         return round(
-            product.price * Decimal(1 + PRODUCT_PRICE_TAX),
+            product.effective_price * Decimal(1 + PRODUCT_PRICE_TAX),
             ndigits=2
         )
 
+    def get_frequently_bought_together(self, product):
+        return RecommendedProductSerializer(
+            [
+                recommendation.recommended_product
+                for recommendation in product.recommendations.all()
+            ],
+            many=True
+        ).data
+
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -56,10 +94,9 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ['pk', 'name', 'body', 'created_at']
 
     def create(self, validated_data):
-        product_slug = self.context['product_slug']
-        product = models.Product.objects.get(slug=product_slug)
+        product_id = self.context['product_id']
         return models.Comment.objects.create(
-            product=product,
+            product_id=product_id,
             **validated_data
         )
 
@@ -80,7 +117,7 @@ class CustomerSerializer(serializers.ModelSerializer):
 class CartItemProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Product
-        fields = ['pk', 'title', 'price']
+        fields = ['pk', 'title', 'price', 'effective_price']
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -92,7 +129,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['pk', 'quantity', 'product', 'total']
 
     def get_total(self, cart_item):
-        return cart_item.quantity * cart_item.product.price
+        return cart_item.quantity * cart_item.product.effective_price
 
 
 class CartItemCreateSerializer(serializers.ModelSerializer):
@@ -105,15 +142,9 @@ class CartItemCreateSerializer(serializers.ModelSerializer):
         quantity = validated_data.get('quantity')
         product = validated_data.get('product')
 
-        try:
-            cart_item = models.CartItem.objects.get(cart_id=cart_id, product=product)
-            cart_item.quantity += quantity
-            cart_item.save()
-        except models.CartItem.DoesNotExist:
-            cart_item = models.CartItem.objects.create(
-                cart_id=cart_id,
-                **validated_data
-            )
+        cart_item = get_cart_storage().add_item(cart_id, product, quantity)
+        if cart_item is None:
+            raise NotFound('Cart with this id does not exist.')
 
         self.instance = cart_item
         return cart_item
@@ -124,8 +155,11 @@ class CartItemUpdateSerializer(serializers.ModelSerializer):
         model = models.CartItem
         fields = ['quantity']
 
+    def update(self, instance, validated_data):
+        return get_cart_storage().update_item(instance, validated_data['quantity'])
+
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
 
@@ -134,7 +168,7 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['pk', 'items', 'total']
 
     def get_total(self, cart):
-        return sum([item.quantity * item.product.price for item in cart.items.all()])
+        return cart.subtotal
 
 
 class OrderItemProductSerializer(serializers.ModelSerializer):
@@ -155,7 +189,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return order_item.quantity * order_item.price
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
 
@@ -168,35 +202,46 @@ class OrderSerializer(serializers.ModelSerializer):
         return sum([item.quantity * item.price for item in order.items.all()])
 
 
+class OrderSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    items_count = serializers.IntegerField(read_only=True)
+    total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = models.Order
+        fields = ['pk', 'status', 'created_at', 'items_count', 'total']
+
+
 class OrderCreateSerializer(serializers.Serializer):
     cart_pk = serializers.UUIDField()
 
     def validate_cart_pk(self, cart_pk):
-        if not models.Cart.objects.filter(pk=cart_pk).exists():
+        cart = get_cart_storage().get_cart(cart_pk)
+        if cart is None:
             raise serializers.ValidationError('Cart with this id does not exist.')
 
-        if models.CartItem.objects.filter(cart_id=cart_pk).count() == 0:
+        if len(cart.items.all()) == 0:
             raise serializers.ValidationError('Cart is empty.')
 
         return cart_pk
 
     def save(self, **kwargs):
-        with transaction.atomic():
-            cart_pk = self.validated_data['cart_pk']
-            user_pk = self.context['user_pk']
-            customer = models.Customer.objects.get(user_id=user_pk)
+        cart_pk = self.validated_data['cart_pk']
+        customer_pk = self.context['customer_pk']
+
+        # The order commits on the primary before the cart is removed from
+        # its shard, so a failure in between leaves the cart to retry.
+        with get_cart_storage().checkout(cart_pk) as cart_items, transaction.atomic():
+            if not cart_items:
+                raise serializers.ValidationError({'cart_pk': ['Cart is empty.']})
 
             order = models.Order()
-            order.customer_id = customer.pk
+            order.customer_id = customer_pk
             order.save()
 
-            cart_items = models.CartItem.objects.filter(cart_id=cart_pk) \
-                .select_related('product')
-
             order_items = [
                 models.OrderItem(
                     quantity=cart_item.quantity,
-                    price=cart_item.product.price,
+                    price=cart_item.product.effective_price,
                     order_id=order.pk,
                     product_id=cart_item.product_id
                 )
@@ -204,5 +249,5 @@ class OrderCreateSerializer(serializers.Serializer):
             ]
 
             models.OrderItem.objects.bulk_create(order_items)
-            models.Cart.objects.get(pk=cart_pk).delete()
+            rollups.add_order_sales([order.pk])
             return order
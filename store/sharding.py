@@ -0,0 +1,40 @@
+from bisect import bisect
+from functools import lru_cache
+from uuid import UUID
+import hashlib
+
+from django.conf import settings
+
+
+def get_hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, nodes, replicas=100):
+        points = sorted(
+            (get_hash(f'{node}:{replica}'), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self.hashes = [point_hash for point_hash, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        index = bisect(self.hashes, get_hash(key)) % len(self.hashes)
+        return self.nodes[index]
+
+
+@lru_cache
+def load_hash_ring(nodes):
+    return HashRing(nodes)
+
+
+def get_cart_shards():
+    return list(settings.CART_SHARDS)
+
+
+def get_cart_shard(cart_id):
+    if not isinstance(cart_id, UUID):
+        cart_id = UUID(str(cart_id))
+    return load_hash_ring(tuple(settings.CART_SHARDS)).get_node(cart_id.hex)
@@ -1,11 +1,176 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from store.models import Customer
+from store import cache
+from store import carts
+from store import counters
+from store import pricing
+from store.models import Cart, CartItem, Category, Comment, Customer, Discount, Product
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer(sender, instance, created, **kwargs):
     if created:
         Customer.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_feed(sender, instance, **kwargs):
+    cache.invalidate_comment_feeds([instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_id(sender, instance, **kwargs):
+    cache.invalidate_product_id(instance.slug)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    cache.invalidate_catalog()
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_comment(sender, instance, raw, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Comment.objects.filter(pk=instance.pk) \
+            .values('product_id', 'status') \
+            .first()
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_counters(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        counters.add_comments(instance.product_id, instance.status, 1)
+    elif previous['product_id'] != instance.product_id:
+        counters.add_comments(previous['product_id'], previous['status'], -1)
+        counters.add_comments(instance.product_id, instance.status, 1)
+    elif previous['status'] != instance.status:
+        counters.move_comments(
+            instance.product_id,
+            previous['status'],
+            instance.status,
+            1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counters(sender, instance, **kwargs):
+    counters.add_comments(instance.product_id, instance.status, -1)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_product(sender, instance, raw, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Product.objects.filter(pk=instance.pk) \
+            .annotate(best_discount=Max('discounts__discount')) \
+            .values('category_id', 'price', 'effective_price', 'best_discount') \
+            .first()
+
+
+@receiver(pre_save, sender=Product)
+def set_effective_price(sender, instance, raw, **kwargs):
+    if raw:
+        if instance.effective_price is None:
+            instance.effective_price = instance.price
+        return
+
+    previous = getattr(instance, '_previous', None)
+    best_discount = previous['best_discount'] if previous else None
+    instance.effective_price = pricing.apply_discount(instance.price, best_discount)
+
+
+@receiver(post_save, sender=Product)
+def update_category_counters(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        counters.add_products(instance.category_id, 1)
+    elif previous['category_id'] != instance.category_id:
+        counters.add_products(previous['category_id'], -1)
+        counters.add_products(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Product)
+def decrement_category_counters(sender, instance, **kwargs):
+    counters.add_products(instance.category_id, -1)
+
+
+@receiver(post_delete, sender=Product)
+def delete_sharded_cart_items(sender, instance, **kwargs):
+    # The cascade only reaches items on the product's own database.
+    carts.delete_cart_items_for_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def refresh_carts_on_price_change(sender, instance, created, raw, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if (
+        not raw
+        and previous is not None
+        and previous['effective_price'] != instance.effective_price
+    ):
+        carts.refresh_carts_for_products([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.discounts.through)
+def refresh_prices_on_discounts_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_product_ids = list(
+            instance.product_set.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = instance._cleared_product_ids
+    else:
+        product_ids = pk_set
+    pricing.refresh_effective_prices(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(post_save, sender=Discount)
+def refresh_prices_on_discount_save(sender, instance, created, raw, **kwargs):
+    if not raw and not created:
+        pricing.refresh_effective_prices(Product.objects.filter(discounts=instance))
+
+
+@receiver(pre_delete, sender=Discount)
+def remember_discounted_products(sender, instance, **kwargs):
+    instance._product_ids = list(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Discount)
+def refresh_prices_on_discount_delete(sender, instance, **kwargs):
+    pricing.refresh_effective_prices(
+        Product.objects.filter(pk__in=instance._product_ids)
+    )
+
+
+@receiver(pre_save, sender=CartItem)
+def set_cart_item_unit_price(sender, instance, raw, **kwargs):
+    if not raw:
+        instance.unit_price = instance.product.effective_price
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def refresh_cart_totals(sender, instance, using, raw=False, origin=None, **kwargs):
+    # Items deleted along with their cart need no refresh.
+    if raw or isinstance(origin, Cart) or getattr(origin, 'model', None) is Cart:
+        return
+    carts.refresh_cart_totals(
+        Cart.objects.using(using).filter(pk=instance.cart_id),
+        touch=True
+    )
@@ -0,0 +1,167 @@
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store import models
+from store.sharding import get_cart_shard
+
+ROWS_COUNT = 100
+
+
+class AdminQueryCountTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.superuser = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='password',
+            first_name='Admin',
+            last_name='User'
+        )
+        users = [
+            User.objects.create_user(
+                email=f'user{index}@example.com',
+                username=f'user{index}',
+                password='password',
+                first_name=f'First{index}',
+                last_name=f'Last{index}'
+            )
+            for index in range(ROWS_COUNT)
+        ]
+        customers = [user.customer for user in users]
+        models.Address.objects.bulk_create([
+            models.Address(customer=customer, province='Province', city='City', address='Street')
+            for customer in customers
+        ])
+
+        categories = models.Category.objects.bulk_create([
+            models.Category(title=f'Category {index}') for index in range(ROWS_COUNT)
+        ])
+        models.Discount.objects.bulk_create([
+            models.Discount(discount=0.1, description=f'Discount {index}')
+            for index in range(ROWS_COUNT)
+        ])
+        products = models.Product.objects.bulk_create([
+            models.Product(
+                title=f'Product {index}',
+                slug=f'product-{index}',
+                description='',
+                price=Decimal('10.00'),
+                effective_price=Decimal('10.00'),
+                category=category
+            )
+            for index, category in enumerate(categories)
+        ])
+        models.Comment.objects.bulk_create([
+            models.Comment(name='Name', body='Body', product=product)
+            for product in products
+        ])
+
+        models.Cart.objects.bulk_create([models.Cart() for _ in range(ROWS_COUNT)])
+        cls.carts = {}
+        cls.orders = {}
+        for rows_count in [10, ROWS_COUNT]:
+            cart_id = uuid4()
+            cart = cls.carts[rows_count] = models.Cart.objects.using(get_cart_shard(cart_id)) \
+                .create(id=cart_id)
+            models.CartItem.objects.using(get_cart_shard(cart.pk)).bulk_create([
+                models.CartItem(
+                    cart=cart,
+                    product=product,
+                    quantity=1,
+                    unit_price=product.effective_price
+                )
+                for product in products[:rows_count]
+            ])
+            order = cls.orders[rows_count] = models.Order.objects.create(customer=customers[0])
+            models.OrderItem.objects.bulk_create([
+                models.OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in products[:rows_count]
+            ])
+        models.Order.objects.bulk_create([
+            models.Order(customer=customer) for customer in customers
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def get_query_count(self, url):
+        # Carts and their items are read from the shard they live on.
+        with ExitStack() as stack:
+            queries = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum(len(captured) for captured in queries), response
+
+    def assert_changelist_queries_constant(self, model, query_string=''):
+        model_admin = admin.site._registry[model]
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        url += query_string
+        # Warms up per-process caches (content types, permissions) first.
+        self.client.get(url)
+        with patch.object(model_admin, 'list_per_page', 10):
+            expected_count, _ = self.get_query_count(url)
+        with patch.object(model_admin, 'list_per_page', ROWS_COUNT):
+            queries_count, response = self.get_query_count(url)
+        self.assertEqual(queries_count, expected_count)
+        self.assertEqual(len(response.context['cl'].result_list), ROWS_COUNT)
+
+    def test_changelists(self):
+        for model in [
+            get_user_model(),
+            models.Category,
+            models.Discount,
+            models.Product,
+            models.Comment,
+            models.Customer,
+            models.Address,
+            models.Cart,
+            models.Order,
+            models.OrderItem,
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assert_changelist_queries_constant(model)
+
+    def test_cart_item_changelist(self):
+        # Lists the shard holding the cart with 100 items.
+        shard = get_cart_shard(self.carts[ROWS_COUNT].pk)
+        self.assert_changelist_queries_constant(models.CartItem, f'?shard={shard}')
+
+    def assert_change_view_queries_constant(self, instances):
+        model = type(instances[10])
+        urls = {
+            rows_count: reverse(
+                f'admin:{model._meta.app_label}_{model._meta.model_name}_change',
+                args=[instance.pk]
+            )
+            for rows_count, instance in instances.items()
+        }
+        self.client.get(urls[10])
+        expected_count, _ = self.get_query_count(urls[10])
+        queries_count, _ = self.get_query_count(urls[ROWS_COUNT])
+        self.assertEqual(queries_count, expected_count)
+
+    def test_order_change_view(self):
+        self.assert_change_view_queries_constant(self.orders)
+
+    def test_cart_change_view(self):
+        self.assert_change_view_queries_constant(self.carts)
+
+    def test_customer_change_view(self):
+        customer = models.Customer.objects.first()
+        url = reverse('admin:store_customer_change', args=[customer.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
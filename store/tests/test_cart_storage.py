@@ -0,0 +1,238 @@
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from store import models
+from store.cart_storage import get_cart_storage, load_cart_storage
+from store.sharding import get_cart_shard, get_cart_shards
+
+DATABASE_BACKEND = 'store.cart_storage.DatabaseCartStorage'
+CACHE_BACKEND = 'store.cart_storage.CacheCartStorage'
+# Ids and timestamps differ between runs; everything else must match.
+VOLATILE_KEYS = ['pk', 'id', 'created_at']
+
+
+def use_cart_storage(backend):
+    return override_settings(CART_STORAGE={
+        **settings.CART_STORAGE,
+        'BACKEND': backend,
+        # Tests flush explicitly instead of waiting for the timer.
+        'FLUSH_INTERVAL': 60 * 60,
+        'LOCK_TIMEOUT': 0.05,
+    })
+
+
+def normalize(data, parent_key=None):
+    if isinstance(data, list):
+        return [normalize(value) for value in data]
+    if isinstance(data, dict):
+        return {
+            key: normalize(value, key)
+            for key, value in data.items()
+            # Products are shared by both runs, so their ids are compared.
+            if key not in VOLATILE_KEYS or parent_key == 'product'
+        }
+    return data
+
+
+class CartStorageTestCase(TestCase):
+    databases = '__all__'
+    backend = CACHE_BACKEND
+
+    @classmethod
+    def setUpTestData(cls):
+        category = models.Category.objects.create(title='Category')
+        cls.products = models.Product.objects.bulk_create([
+            models.Product(
+                title=f'Product {index}',
+                slug=f'product-{index}',
+                description='',
+                price=Decimal('10.00') * index,
+                effective_price=Decimal('10.00') * index,
+                category=category
+            )
+            for index in range(1, 3)
+        ])
+        user = get_user_model().objects.create_user(
+            email='customer@example.com',
+            username='customer',
+            password='password'
+        )
+        cls.authorization = f'JWT {RefreshToken.for_user(user).access_token}'
+
+    def setUp(self):
+        cache.clear()
+        self.settings_override = use_cart_storage(self.backend)
+        self.settings_override.enable()
+        load_cart_storage.cache_clear()
+        self.addCleanup(self.stop_storage)
+
+    def stop_storage(self):
+        storage = get_cart_storage()
+        if getattr(storage, 'timer', None) is not None:
+            storage.timer.cancel()
+        load_cart_storage.cache_clear()
+        self.settings_override.disable()
+
+
+class CartApiContractTests(CartStorageTestCase):
+    def run_cart_session(self):
+        responses = []
+
+        def request(method, url, data=None, **headers):
+            response = getattr(self.client, method)(
+                url, data, content_type='application/json', **headers
+            )
+            responses.append((method, response.status_code, normalize(response.json())
+                              if response.content else None))
+            return response
+
+        first_product, second_product = self.products
+        cart_id = request('post', reverse('store:cart-list')).json()['pk']
+        items_url = reverse('store:cart-item-list', args=[cart_id])
+        request('post', items_url, {'product': first_product.pk, 'quantity': 2})
+        request('post', items_url, {'product': first_product.pk, 'quantity': 1})
+        request('post', items_url, {'product': second_product.pk, 'quantity': 1})
+        items = {item['product']['pk']: item['pk'] for item in request('get', items_url).json()}
+
+        request(
+            'patch',
+            reverse('store:cart-item-detail', args=[cart_id, items[first_product.pk]]),
+            {'quantity': 5}
+        )
+        request(
+            'delete',
+            reverse('store:cart-item-detail', args=[cart_id, items[second_product.pk]])
+        )
+        request('get', reverse('store:cart-item-detail', args=[cart_id, 0]))
+        request('get', reverse('store:cart-detail', args=[cart_id]))
+        request('post', reverse('store:cart-item-list', args=[uuid4()]), {
+            'product': first_product.pk,
+            'quantity': 1,
+        })
+        # The cached cart is dropped once the shard commits its removal.
+        with self.captureOnCommitCallbacks(using=get_cart_shard(cart_id), execute=True):
+            request(
+                'post',
+                reverse('store:order-list'),
+                {'cart_pk': cart_id},
+                HTTP_AUTHORIZATION=self.authorization
+            )
+        request('get', reverse('store:cart-detail', args=[cart_id]))
+        return responses
+
+    def test_backends_return_identical_responses(self):
+        self.maxDiff = None
+        responses = {}
+        for backend in [DATABASE_BACKEND, CACHE_BACKEND]:
+            with self.subTest(backend=backend), use_cart_storage(backend):
+                load_cart_storage.cache_clear()
+                responses[backend] = self.run_cart_session()
+
+        self.assertEqual(
+            [status_code for _, status_code, _ in responses[DATABASE_BACKEND]],
+            [201, 201, 201, 201, 200, 200, 204, 404, 200, 404, 200, 404]
+        )
+        self.assertEqual(responses[CACHE_BACKEND], responses[DATABASE_BACKEND])
+
+
+class CacheCartStorageTests(CartStorageTestCase):
+    def create_cart(self, quantities):
+        storage = get_cart_storage()
+        cart = storage.create_cart()
+        for product, quantity in zip(self.products, quantities):
+            storage.add_item(cart.pk, product, quantity)
+        return cart.pk
+
+    def test_flush_writes_carts_to_their_shard(self):
+        storage = get_cart_storage()
+        cart_id = self.create_cart([2, 3])
+        shard = get_cart_shard(cart_id)
+
+        storage.flush()
+
+        for alias in get_cart_shards():
+            with self.subTest(alias=alias):
+                self.assertEqual(
+                    models.Cart.objects.using(alias).filter(pk=cart_id).exists(),
+                    alias == shard
+                )
+        self.assertEqual(
+            sorted(
+                models.CartItem.objects.using(shard)
+                .filter(cart_id=cart_id)
+                .values_list('product_id', 'quantity', 'unit_price')
+            ),
+            [
+                (self.products[0].pk, 2, self.products[0].effective_price),
+                (self.products[1].pk, 3, self.products[1].effective_price),
+            ]
+        )
+        cart = models.Cart.objects.using(shard).get(pk=cart_id)
+        self.assertEqual(cart.items_count, 5)
+        self.assertEqual(cart.subtotal, Decimal('80.00'))
+
+    def test_flush_applies_later_changes_and_deletes(self):
+        storage = get_cart_storage()
+        cart_id = self.create_cart([2, 3])
+        shard = get_cart_shard(cart_id)
+        storage.flush()
+
+        storage.remove_item(storage.get_item(cart_id, storage.get_items(cart_id)[1].pk))
+        storage.update_item(storage.get_items(cart_id)[0], 7)
+        storage.flush()
+        self.assertEqual(
+            list(
+                models.CartItem.objects.using(shard)
+                .filter(cart_id=cart_id)
+                .values_list('product_id', 'quantity')
+            ),
+            [(self.products[0].pk, 7)]
+        )
+
+        storage.delete_cart(cart_id)
+        storage.flush()
+        self.assertFalse(models.Cart.objects.using(shard).filter(pk=cart_id).exists())
+        self.assertIsNone(storage.get_cart(cart_id))
+
+    def test_checkout_removes_cached_state_and_shard_rows(self):
+        storage = get_cart_storage()
+        cart_id = self.create_cart([1, 1])
+        shard = get_cart_shard(cart_id)
+        storage.flush()
+
+        with self.captureOnCommitCallbacks(using=shard, execute=True):
+            response = self.client.post(
+                reverse('store:order-list'),
+                {'cart_pk': str(cart_id)},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.authorization
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 2)
+        self.assertIsNone(cache.get(storage.get_state_key(cart_id)))
+        self.assertFalse(models.Cart.objects.using(shard).filter(pk=cart_id).exists())
+        self.assertFalse(models.CartItem.objects.using(shard).filter(cart_id=cart_id).exists())
+        self.assertNotIn(cart_id, storage.dirty_cart_ids)
+
+    def test_writes_wait_for_checkout(self):
+        storage = get_cart_storage()
+        cart_id = self.create_cart([1])
+
+        # Checkout holds the cart's lock while it reads the items, so the
+        # snapshot cannot change underneath it.
+        with storage.checkout(cart_id) as cart_items:
+            response = self.client.post(
+                reverse('store:cart-item-list', args=[cart_id]),
+                {'product': self.products[0].pk, 'quantity': 1},
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual([item.quantity for item in cart_items], [1])
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from store import models
+
+CACHE_HIT = 'cache;desc="hit"'
+
+
+class CatalogResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = models.Category.objects.create(title='Category')
+        models.Product.objects.create(
+            title='Product',
+            slug='product',
+            description='',
+            price=Decimal('10.00'),
+            effective_price=Decimal('10.00'),
+            category=category
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, client, accept):
+        response = client.get(reverse('store:product-list'), HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def is_cache_hit(self, response):
+        return CACHE_HIT in response.get('Server-Timing', '')
+
+    def test_json_is_served_from_cache(self):
+        first_response = self.get(self.client, 'application/json')
+        second_response = self.get(self.client_class(), 'application/json')
+
+        self.assertFalse(self.is_cache_hit(first_response))
+        self.assertTrue(self.is_cache_hit(second_response))
+        self.assertEqual(second_response.content, first_response.content)
+
+    def test_html_is_never_served_from_cache(self):
+        for accept in ['application/json', 'text/html', 'text/html']:
+            response = self.get(self.client_class(), accept)
+
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(self.is_cache_hit(response))
+        # Every visitor gets its own CSRF token.
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_cached_json_is_not_served_as_html(self):
+        self.get(self.client, 'application/json')
+        response = self.get(self.client_class(), 'text/html')
+
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(self.is_cache_hit(response))
@@ -0,0 +1,113 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import APIException
+
+from store import idempotency
+from store import models
+from store.cart_storage import DatabaseCartStorage
+from store.sharding import get_cart_shards
+
+
+class IdempotentCreateTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = models.Category.objects.create(title='Category')
+        cls.product = models.Product.objects.create(
+            title='Product',
+            slug='product',
+            description='',
+            price=Decimal('10.00'),
+            effective_price=Decimal('10.00'),
+            category=category
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, url, data=None, key='key', address='127.0.0.1'):
+        return self.client.post(
+            url,
+            data,
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+            REMOTE_ADDR=address
+        )
+
+    def get_carts_count(self):
+        return sum(models.Cart.objects.using(alias).count() for alias in get_cart_shards())
+
+    def create_cart(self):
+        return self.client.post(reverse('store:cart-list')).json()['pk']
+
+    def test_same_key_replays_the_response(self):
+        first_response = self.post(reverse('store:cart-list'))
+        second_response = self.post(reverse('store:cart-list'))
+
+        self.assertEqual(first_response.status_code, 201)
+        self.assertEqual(second_response.status_code, 201)
+        self.assertEqual(second_response.json(), first_response.json())
+        self.assertEqual(second_response['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first_response)
+        self.assertEqual(self.get_carts_count(), 1)
+
+    def test_same_key_with_another_body_is_rejected(self):
+        items_url = reverse('store:cart-item-list', args=[self.create_cart()])
+        self.post(items_url, {'product': self.product.pk, 'quantity': 1})
+        response = self.post(items_url, {'product': self.product.pk, 'quantity': 2})
+
+        self.assertEqual(response.status_code, 422)
+        cart_items = self.client.get(items_url).json()
+        self.assertEqual([item['quantity'] for item in cart_items], [1])
+
+    def test_anonymous_keys_are_bound_to_the_client_address(self):
+        first_response = self.post(reverse('store:cart-list'), address='10.0.0.1')
+        second_response = self.post(reverse('store:cart-list'), address='10.0.0.2')
+
+        self.assertNotEqual(second_response.json()['pk'], first_response.json()['pk'])
+        self.assertNotIn('Idempotent-Replayed', second_response)
+        self.assertEqual(self.get_carts_count(), 2)
+
+    def test_server_errors_are_not_stored(self):
+        with patch.object(DatabaseCartStorage, 'create_cart', side_effect=APIException):
+            response = self.post(reverse('store:cart-list'))
+        self.assertEqual(response.status_code, 500)
+
+        response = self.post(reverse('store:cart-list'))
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.get_carts_count(), 1)
+
+    def test_validation_errors_are_not_stored(self):
+        items_url = reverse('store:cart-item-list', args=[self.create_cart()])
+        response = self.post(items_url, {'product': self.product.pk + 1, 'quantity': 1})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post(items_url, {'product': self.product.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_business_errors_are_replayed(self):
+        items_url = reverse('store:cart-item-list', args=['00000000-0000-0000-0000-000000000000'])
+        self.post(items_url, {'product': self.product.pk, 'quantity': 1})
+        response = self.post(items_url, {'product': self.product.pk, 'quantity': 1})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    @override_settings(IDEMPOTENCY={**settings.IDEMPOTENCY, 'LOCK_TIMEOUT': 0.05})
+    def test_duplicates_of_a_running_request_conflict(self):
+        url = reverse('store:cart-list')
+        scope_key = idempotency.get_scope_key(url, 'anonymous:127.0.0.1', 'key')
+
+        with idempotency.lock(scope_key):
+            response = self.post(url)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.get_carts_count(), 0)
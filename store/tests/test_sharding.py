@@ -0,0 +1,122 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from store import models
+from store.cart_storage import DatabaseCartStorage
+from store.sharding import get_cart_shard, get_cart_shards
+
+
+def get_cart_id(shard):
+    while True:
+        cart_id = uuid4()
+        if get_cart_shard(cart_id) == shard:
+            return cart_id
+
+
+# Run with several databases, e.g.
+# CART_SHARD_DATABASES=sqlite:////tmp/carts_1.sqlite3,sqlite:////tmp/carts_2.sqlite3
+@skipUnless(len(settings.CART_SHARDS) > 1, 'Needs several CART_SHARDS.')
+class CartShardingTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = models.Category.objects.create(title='Category')
+        cls.product = models.Product.objects.create(
+            title='Product',
+            slug='product',
+            description='',
+            price=Decimal('10.00'),
+            effective_price=Decimal('10.00'),
+            category=category
+        )
+        cls.shards = get_cart_shards()
+
+    def assert_only_on(self, model, shard, **filters):
+        for alias in self.shards:
+            with self.subTest(model=model.__name__, alias=alias):
+                self.assertEqual(
+                    model.objects.using(alias).filter(**filters).exists(),
+                    alias == shard
+                )
+
+    def test_carts_spread_over_shards(self):
+        cart_ids = [uuid4() for _ in range(300)]
+        self.assertEqual({get_cart_shard(cart_id) for cart_id in cart_ids}, set(self.shards))
+        self.assertEqual(
+            [get_cart_shard(cart_id) for cart_id in cart_ids],
+            [get_cart_shard(str(cart_id)) for cart_id in cart_ids]
+        )
+
+    def test_storage_writes_to_cart_shard(self):
+        storage = DatabaseCartStorage()
+        cart = storage.create_cart()
+        shard = get_cart_shard(cart.pk)
+        storage.add_item(cart.pk, self.product, 2)
+
+        self.assert_only_on(models.Cart, shard, pk=cart.pk)
+        self.assert_only_on(models.CartItem, shard, cart_id=cart.pk)
+        items = storage.get_cart(cart.pk).items.all()
+        self.assertEqual([(item.product, item.quantity) for item in items], [(self.product, 2)])
+
+    def test_rebalance_moves_misplaced_carts(self):
+        source, target = self.shards[0], self.shards[-1]
+        cart_id = get_cart_id(target)
+        cart = models.Cart.objects.using(source).create(id=cart_id)
+        models.CartItem.objects.using(source).create(cart=cart, product=self.product, quantity=3)
+        updated_at = timezone.now() - timedelta(days=10)
+        models.Cart.objects.using(source).filter(pk=cart_id).update(updated_at=updated_at)
+
+        call_command('rebalance_carts', stdout=StringIO())
+
+        self.assert_only_on(models.Cart, target, pk=cart_id)
+        self.assert_only_on(models.CartItem, target, cart_id=cart_id)
+        moved_cart = models.Cart.objects.using(target).get(pk=cart_id)
+        self.assertEqual(moved_cart.updated_at, updated_at)
+        self.assertEqual(moved_cart.items.get().quantity, 3)
+
+    def test_admin_lists_and_changes_carts_on_every_shard(self):
+        self.client.force_login(get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='password'
+        ))
+        storage = DatabaseCartStorage()
+        for shard in self.shards:
+            with self.subTest(shard=shard):
+                cart_id = get_cart_id(shard)
+                models.Cart.objects.using(shard).create(id=cart_id)
+                storage.add_item(cart_id, self.product, 1)
+
+                response = self.client.get(
+                    reverse('admin:store_cart_changelist'), {'shard': shard}
+                )
+                self.assertIn(cart_id, [cart.pk for cart in response.context['cl'].result_list])
+
+                response = self.client.get(
+                    reverse('admin:store_cartitem_changelist'), {'shard': shard}
+                )
+                self.assertIn(
+                    (cart_id, self.product),
+                    [(item.cart_id, item.product) for item in response.context['cl'].result_list]
+                )
+
+                response = self.client.get(
+                    reverse('admin:store_cart_change', args=[cart_id])
+                )
+                self.assertEqual(response.status_code, 200)
+                formset = response.context['inline_admin_formsets'][0].formset
+                self.assertEqual(
+                    [form.instance.product for form in formset.initial_forms],
+                    [self.product]
+                )
@@ -6,6 +6,11 @@ app_name = 'store'
 
 urlpatterns = [
     path('categories/', views.CategoryList.as_view(), name='category-list'),
+    path(
+        'categories/<int:pk>/top-products/',
+        views.CategoryTopProducts.as_view(),
+        name='category-top-products'
+    ),
     path(
         'products/<slug:slug>/comments/',
         views.CommentList.as_view(),
@@ -17,6 +22,22 @@ urlpatterns = [
         name='product-detail'
     ),
     path('products/', views.ProductList.as_view(), name='product-list'),
+    # Outside products/ so it cannot shadow a product with the slug 'batch'.
+    path(
+        'products-batch/',
+        views.ProductBatch.as_view(),
+        name='product-batch'
+    ),
+    path(
+        'exports/products/',
+        views.ProductExport.as_view(),
+        name='product-export'
+    ),
+    path(
+        'imports/products/',
+        views.ProductImport.as_view(),
+        name='product-import'
+    ),
     path('customers/me/', views.CustomerDetail.as_view(), name='customer-me'),
     path('carts/', views.CartList.as_view(), name='cart-list'),
     path('carts/<uuid:pk>/', views.CartDetail.as_view(), name='cart-detail'),
@@ -30,6 +51,8 @@ urlpatterns = [
         views.CartItemDetail.as_view(),
         name='cart-item-detail'
     ),
+    path('reports/sales/', views.SalesReport.as_view(), name='sales-report'),
+    path('batch/', views.Batch.as_view(), name='batch'),
     path('orders/', views.OrderList.as_view(), name='order-list'),
     path('orders/<int:pk>/', views.OrderDetail.as_view(), name='order-detail'),
 ]
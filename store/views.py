@@ -1,50 +1,456 @@
+from decimal import Decimal
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Prefetch
+from django.db.models import DecimalField, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, permissions
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework import generics, permissions, status
+from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
 from rest_framework.response import Response
-
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework.views import APIView
+
+from core import compression
+from core.throttling import CheckoutThrottle, SearchThrottle
+from store import batch
+from store import cache
+from store import exports
+from store import facets
+from store import idempotency
+from store import imports
+from store import ingestion
 from store import models
+from store import rollups
 from store import serializers
-from store.filters import ProductFilter
-from store.paginations import DefaultPagination
+from store.cart_storage import CartLockTimeout, get_cart_storage
+from store.filters import ProductFilter, ProductOrderingFilter
+from store.paginations import DefaultPagination, KeysetPagination
 from store.signals import order_created
 
 
-class CategoryList(generics.ListAPIView):
+class SparseFieldsetViewMixin:
+    fields_query_param = 'fields'
+    # Serializer field -> model columns it reads. Relations in the column
+    # paths are joined only when one of their fields is requested.
+    field_columns = {}
+    # Selected whatever the requested fields are
+    required_columns = ['pk']
+
+    def get_requested_fields(self):
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+
+        field_columns = self.get_field_columns()
+        fields = {field.strip() for field in value.split(',') if field.strip()}
+        unknown_fields = fields - field_columns.keys()
+        if unknown_fields:
+            raise ValidationError({
+                self.fields_query_param: [
+                    f'Unknown fields: {", ".join(sorted(unknown_fields))}. '
+                    f'Choose from: {", ".join(field_columns)}.'
+                ]
+            })
+        return fields
+
+    def get_field_columns(self):
+        return self.field_columns
+
+    def get_fieldset(self):
+        return self.get_requested_fields() or set(self.get_field_columns())
+
+    def get_fieldset_queryset(self, queryset):
+        field_columns = self.get_field_columns()
+        columns = set(self.required_columns) | {
+            column
+            for field in self.get_fieldset()
+            for column in field_columns[field]
+        }
+        relations = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
+
+
+class CatalogResponseCacheMixin:
+    # Catalog responses are the same for every user, so the rendered body is
+    # cached under the catalog version, already compressed for each encoding.
+    # Only renderers whose output depends on the data alone are cached; the
+    # browsable API embeds the visitor's CSRF token and user.
+    cached_renderer_formats = ['json']
+
+    def get(self, request, *args, **kwargs):
+        self.catalog_response_key = None
+        renderer_format = request.accepted_renderer.format
+        if renderer_format not in self.cached_renderer_formats:
+            return super().get(request, *args, **kwargs)
+
+        self.catalog_response_encoding = compression.negotiate_encoding(
+            request.headers.get('Accept-Encoding', '')
+        )
+        self.catalog_response_key = '|'.join([
+            renderer_format,
+            request.get_host(),
+            request.get_full_path(),
+            request.headers.get('Accept', ''),
+        ])
+        cached = cache.get_catalog_response(
+            self.catalog_response_key,
+            self.catalog_response_encoding
+        )
+        if cached is None:
+            return super().get(request, *args, **kwargs)
+
+        response = HttpResponse(cached['content'], content_type=cached['content_type'])
+        if cached['encoding'] is not None:
+            response['Content-Encoding'] = cached['encoding']
+            response['X-Compression-Ratio'] = \
+                f'{cached["original_size"] / max(len(cached["content"]), 1):.2f}'
+        compression.add_server_timing(response, 'cache;desc="hit"')
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        if not isinstance(response, Response) or response.status_code != 200 \
+                or getattr(self, 'catalog_response_key', None) is None \
+                or response.accepted_renderer.format not in self.cached_renderer_formats:
+            return response
+
+        response.render()
+        content = response.content
+        encoding = self.catalog_response_encoding
+        if len(content) < compression.get_compression_settings()['MIN_SIZE']:
+            encoding = None
+        if encoding is not None:
+            compressed, cpu_seconds = compression.compress(content, encoding)
+            response.content = compressed
+            compression.set_compression_headers(
+                response, encoding, len(content), len(compressed), cpu_seconds
+            )
+
+        cache.set_catalog_response(
+            self.catalog_response_key,
+            self.catalog_response_encoding,
+            {
+                'content_type': response['Content-Type'],
+                'encoding': encoding,
+                'content': response.content,
+                'original_size': len(content),
+            }
+        )
+        return response
+
+
+class CategoryList(CatalogResponseCacheMixin, generics.ListAPIView):
     serializer_class = serializers.CategorySerializer
     queryset = models.Category.objects.all().order_by('title')
 
 
-class ProductList(generics.ListAPIView):
+PRODUCT_FIELD_COLUMNS = {
+    'pk': [],
+    'title': ['title'],
+    'price': ['price'],
+    'effective_price': ['effective_price'],
+    'price_after_tax': ['effective_price'],
+    'category': ['category__title'],
+    'comments_count': ['approved_comments_count'],
+}
+
+
+class ProductList(CatalogResponseCacheMixin, SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = serializers.ProductSerializer
-    queryset = models.Product.objects.select_related('category') \
-        .order_by('-created_at')
-    filter_backends = [SearchFilter, DjangoFilterBackend, OrderingFilter]
+    # The serializer never outputs description, so it is never selected.
+    field_columns = PRODUCT_FIELD_COLUMNS
+    filter_backends = [SearchFilter, DjangoFilterBackend, ProductOrderingFilter]
+    throttle_classes = [SearchThrottle]
     search_fields = ['title']
     filterset_class = ProductFilter
-    ordering_fields = ['price', 'created_at']
+    ordering_fields = ['price', 'created_at', 'popularity']
     pagination_class = DefaultPagination
+    facets_query_param = 'facets'
+    # Parameters that do not change which products match.
+    facets_ignored_params = ['facets', 'fields', 'ordering', 'page']
 
+    def get_queryset(self):
+        return self.get_fieldset_queryset(
+            models.Product.objects.order_by('-created_at')
+        )
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.facets_query_param in request.query_params:
+            response.data['facets'] = self.get_facets()
+        return response
+
+    def get_facets(self):
+        params = [
+            (key, value)
+            for key, values in self.request.query_params.lists()
+            if key not in self.facets_ignored_params
+            for value in values
+        ]
+        product_facets = cache.get_product_facets(params)
+        if product_facets is None:
+            product_facets = facets.get_product_facets(
+                self.filter_queryset(self.get_queryset())
+            )
+            cache.set_product_facets(params, product_facets)
+        return product_facets
 
-class ProductDetail(generics.RetrieveAPIView):
+
+class CategoryTopProducts(CatalogResponseCacheMixin, generics.ListAPIView):
+    serializer_class = serializers.ProductSerializer
+
+    def list(self, request, *args, **kwargs):
+        category_id = self.kwargs['pk']
+        data = cache.get_top_products(category_id)
+        if data is None:
+            products = models.Product.objects.select_related('category') \
+                .defer('description') \
+                .filter(category_id=category_id) \
+                .order_by('-popularity', '-pk')[:settings.POPULARITY['TOP_PRODUCTS_LIMIT']]
+            data = self.get_serializer(products, many=True).data
+            cache.set_top_products(category_id, data)
+        return Response(data)
+
+
+class ProductBatch(CatalogResponseCacheMixin, APIView):
+    lookup_params = ['ids', 'slugs']
+
+    def get_lookup_values(self, request):
+        params = [param for param in self.lookup_params if param in request.query_params]
+        if len(params) != 1:
+            raise ValidationError({
+                'detail': [f'Pass exactly one of: {", ".join(self.lookup_params)}.']
+            })
+
+        param = params[0]
+        values = list(dict.fromkeys(
+            value.strip()
+            for value in request.query_params[param].split(',')
+            if value.strip()
+        ))
+        if not values or len(values) > settings.PRODUCT_BATCH_MAX_SIZE:
+            raise ValidationError({
+                param: [f'Pass between 1 and {settings.PRODUCT_BATCH_MAX_SIZE} values.']
+            })
+        if param == 'ids':
+            if not all(value.isdigit() for value in values):
+                raise ValidationError({param: ['Pass a comma-separated list of ids.']})
+            return list(dict.fromkeys(int(value) for value in values))
+
+        product_ids = cache.get_product_ids(values)
+        return list(dict.fromkeys(
+            product_ids[slug] for slug in values if slug in product_ids
+        ))
+
+    def get(self, request):
+        product_ids = self.get_lookup_values(request)
+        products = cache.get_products(product_ids)
+        missing_ids = [pk for pk in product_ids if pk not in products]
+        if missing_ids:
+            queryset = models.Product.objects.select_related('category') \
+                .defer('description') \
+                .filter(pk__in=missing_ids)
+            found_products = {
+                data['pk']: data
+                for data in serializers.ProductSerializer(queryset, many=True).data
+            }
+            cache.set_products(found_products)
+            products.update(found_products)
+
+        # Unknown ids and slugs are left out; the rest keep the request order.
+        return Response([products[pk] for pk in product_ids if pk in products])
+
+
+class ProductExport(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    # `format` is taken by DRF's content negotiation.
+    export_format_query_param = 'export_format'
+
+    def get(self, request):
+        export_format = request.query_params.get(self.export_format_query_param, 'csv')
+        if export_format not in exports.EXPORT_FORMATS:
+            raise ValidationError({
+                self.export_format_query_param: [
+                    f'Choose one of: {", ".join(exports.EXPORT_FORMATS)}.'
+                ]
+            })
+
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = exports.parse_since(since)
+            except ValueError as error:
+                raise ValidationError({'since': [str(error)]})
+
+        # Clients pass this back as `since` for the next incremental export.
+        started_at = timezone.now()
+        fields = exports.get_export_fields('description' in request.query_params)
+        chunks = exports.iter_batched(exports.iter_export(
+            export_format,
+            fields,
+            exports.get_export_rows(fields, since)
+        ))
+
+        # CompressionMiddleware compresses the chunks as they are streamed.
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=exports.EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+        response['X-Export-Timestamp'] = started_at.isoformat()
+        return response
+
+
+class ProductImport(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+    import_format_query_param = 'import_format'
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+
+        import_format = request.query_params.get(
+            self.import_format_query_param,
+            upload.name.rsplit('.', 1)[-1].lower()
+        )
+        if import_format not in imports.IMPORT_FORMATS:
+            raise ValidationError({
+                self.import_format_query_param: [
+                    f'Choose one of: {", ".join(imports.IMPORT_FORMATS)}.'
+                ]
+            })
+
+        # Large uploads are spooled to disk and parsed as a stream.
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = imports.ProductImporter().import_stream(stream, import_format)
+        return Response(report)
+
+
+class SalesReport(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    group_by_choices = ['day', 'category', 'product']
+    max_rows = 500
+
+    def get(self, request):
+        # Reads only the rollup tables, never orders or order items.
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in self.group_by_choices:
+            raise ValidationError({
+                'group_by': [f'Choose one of: {", ".join(self.group_by_choices)}.']
+            })
+
+        filters = {}
+        for param, lookup in [('start', 'day__gte'), ('end', 'day__lte')]:
+            value = request.query_params.get(param)
+            if value is not None:
+                day = parse_date(value)
+                if day is None:
+                    raise ValidationError({param: ['Enter a date in YYYY-MM-DD format.']})
+                filters[lookup] = day
+
+        status_filter = request.query_params.get('status')
+        if status_filter is not None:
+            if status_filter not in dict(models.Order.STATUS_CHOICES):
+                raise ValidationError({'status': ['Not a valid order status.']})
+            filters['status'] = status_filter
+
+        rows = rollups.get_sales_report(group_by, filters)[:self.max_rows]
+        return Response({'group_by': group_by, 'results': list(rows)})
+
+
+class ProductDetail(CatalogResponseCacheMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     serializer_class = serializers.ProductDetailSerializer
-    queryset = models.Product.objects.select_related('category')
     lookup_field = 'slug'
+    field_columns = {
+        **PRODUCT_FIELD_COLUMNS,
+        'description': ['description'],
+        'frequently_bought_together': [],
+    }
+
+    def get_queryset(self):
+        queryset = self.get_fieldset_queryset(models.Product.objects.all())
+        if 'frequently_bought_together' in self.get_fieldset():
+            # Recommendations come from one lookup on the (product, rank) index.
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'recommendations',
+                    queryset=models.ProductRecommendation.objects
+                    .select_related('recommended_product')
+                    .only(
+                        'product_id',
+                        'recommended_product__title',
+                        'recommended_product__slug',
+                        'recommended_product__effective_price'
+                    )
+                    .order_by('rank')
+                )
+            )
+        return queryset
 
 
 class CommentList(generics.ListCreateAPIView):
     serializer_class = serializers.CommentSerializer
+    pagination_class = KeysetPagination
+
+    def get_product_id(self):
+        product_id = cache.get_product_id(self.kwargs['slug'])
+        if product_id is None:
+            raise Http404
+        return product_id
 
     def get_queryset(self):
-        product_slug = self.kwargs['slug']
-        return models.Comment.objects.filter(product__slug=product_slug) \
-            .order_by('-created_at')
+        return models.Comment.approved.filter(product_id=self.get_product_id())
 
     def get_serializer_context(self):
-        product_slug = self.kwargs['slug']
-        return {'product_slug': product_slug}
+        return {'product_id': self.get_product_id()}
+
+    def list(self, request, *args, **kwargs):
+        product_id = self.get_product_id()
+        is_first_page = self.paginator.cursor_query_param not in request.query_params
+
+        if is_first_page:
+            data = cache.get_comment_feed(product_id)
+            if data is not None:
+                return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+
+        if is_first_page:
+            cache.set_comment_feed(product_id, response.data)
+        return response
+
+    def create(self, request, *args, **kwargs):
+        if not ingestion.is_buffered():
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ingestion.enqueue_comment(self.get_product_id(), serializer.validated_data)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
 class CustomerDetail(generics.RetrieveUpdateAPIView):
@@ -53,33 +459,112 @@ class CustomerDetail(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return models.Customer.objects.select_related('user') \
-            .get(user_id=self.request.user.id)
+        customer = get_object_or_404(
+            models.Customer,
+            pk=self.request.user.customer_pk
+        )
+        customer.user = self.request.user
+        return customer
+
+
+class IdempotentCreateMixin:
+    idempotency_header = 'Idempotency-Key'
+
+    def post(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(self.idempotency_header)
+        if idempotency_key is None:
+            return super().post(request, *args, **kwargs)
+        if not 0 < len(idempotency_key) <= 255:
+            raise ValidationError({self.idempotency_header: ['Use 1 to 255 characters.']})
+
+        # Anonymous clients share no user id, so the key is also bound to the
+        # client address; otherwise a guessed key would replay another
+        # client's cart id, which is all it takes to use that cart.
+        client = request.user.pk if request.user.is_authenticated \
+            else f'anonymous:{BaseThrottle().get_ident(request)}'
+        scope_key = idempotency.get_scope_key(request.path, client, idempotency_key)
+        fingerprint = idempotency.get_fingerprint(request.data)
+        try:
+            with idempotency.lock(scope_key):
+                stored = idempotency.get_response(scope_key)
+                if stored is None:
+                    try:
+                        response = super().post(request, *args, **kwargs)
+                    except ValidationError:
+                        # Rejected input is not stored, so a corrected retry
+                        # with the same key runs again.
+                        raise
+                    except APIException as error:
+                        response = self.handle_exception(error)
+                    # Server errors are left out so the client can retry them.
+                    if status.is_success(response.status_code) \
+                            or status.is_client_error(response.status_code):
+                        idempotency.set_response(scope_key, fingerprint, response)
+                    return response
+        except idempotency.IdempotencyLockTimeout:
+            return Response(
+                {'detail': 'A request with this idempotency key is still in progress.'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if stored['fingerprint'] != fingerprint:
+            return Response(
+                {'detail': 'This idempotency key was used with a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(
+            stored['data'],
+            status=stored['status'],
+            headers={'Idempotent-Replayed': 'true'}
+        )
+
+
+class CartStorageErrorsMixin:
+    def handle_exception(self, exc):
+        # Lock timeouts are retryable, so they are answered here rather than
+        # stored with an idempotency key.
+        if isinstance(exc, CartLockTimeout):
+            return Response(
+                {'detail': 'The cart is being updated by another request. Retry shortly.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        # Raised when the item is removed while it is being updated.
+        if isinstance(exc, models.CartItem.DoesNotExist):
+            exc = NotFound('Cart item does not exist.')
+        return super().handle_exception(exc)
 
 
-class CartList(generics.CreateAPIView):
+class CartList(IdempotentCreateMixin, generics.CreateAPIView):
     serializer_class = serializers.CartSerializer
-    queryset = models.Cart.objects.all()
+
+    def create(self, request, *args, **kwargs):
+        cart = get_cart_storage().create_cart()
+        serializer = self.get_serializer(cart)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class CartDetail(generics.RetrieveDestroyAPIView):
+class CartDetail(SparseFieldsetViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = serializers.CartSerializer
     lookup_value_regex = '[0-9a-fA-F]{8}\-?[0-9a-fA-F]{4}\-?[0-9a-fA-F]{4}\-?[0-9a-fA-F]{4}\-?[0-9a-fA-F]{12}'
+    field_columns = {'pk': [], 'items': [], 'total': []}
 
-    def get_queryset(self):
-        return models.Cart.objects.prefetch_related(
-            Prefetch(
-                'items',
-                queryset=models.CartItem.objects.select_related('product')
-            )
+    def get_object(self):
+        cart = get_cart_storage().get_cart(
+            self.kwargs['pk'],
+            include_items='items' in self.get_fieldset()
         )
+        if cart is None:
+            raise Http404
+        return cart
+
+    def perform_destroy(self, instance):
+        get_cart_storage().delete_cart(instance.pk)
 
 
-class CartItemList(generics.ListCreateAPIView):
+class CartItemList(CartStorageErrorsMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     def get_queryset(self):
         cart_id = self.kwargs['pk']
-        return models.CartItem.objects.filter(cart_id=cart_id) \
-            .select_related('product')
+        return get_cart_storage().get_items(cart_id)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -91,45 +576,99 @@ class CartItemList(generics.ListCreateAPIView):
         return {'cart_id': cart_id}
 
 
-class CartItemDetail(generics.RetrieveUpdateDestroyAPIView):
+class CartItemDetail(CartStorageErrorsMixin, generics.RetrieveUpdateDestroyAPIView):
     http_method_names = ['get', 'patch', 'delete']
 
     def get_object(self):
-        cart_item_pk = self.kwargs['cart_item_pk']
-        return get_object_or_404(
-            models.CartItem.objects.select_related('product'),
-            pk=cart_item_pk
+        cart_item = get_cart_storage().get_item(
+            self.kwargs['pk'],
+            self.kwargs['cart_item_pk']
         )
+        if cart_item is None:
+            raise Http404
+        return cart_item
 
     def get_serializer_class(self):
         if self.request.method == 'PATCH':
             return serializers.CartItemUpdateSerializer
         return serializers.CartItemSerializer
 
+    def perform_destroy(self, instance):
+        get_cart_storage().remove_item(instance)
 
-class OrderList(generics.ListCreateAPIView):
+
+class OrderList(
+    CartStorageErrorsMixin,
+    IdempotentCreateMixin,
+    SparseFieldsetViewMixin,
+    generics.ListCreateAPIView
+):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status']
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    throttle_classes = [CheckoutThrottle]
+    summary_query_param = 'summary'
+    # The pagination cursor is built from these.
+    required_columns = ['pk', 'created_at']
+    field_columns = {
+        'pk': [],
+        'status': ['status'],
+        'created_at': ['created_at'],
+        'items': [],
+        'total': [],
+    }
+    summary_field_columns = {
+        'pk': [],
+        'status': ['status'],
+        'created_at': ['created_at'],
+        'items_count': [],
+        'total': [],
+    }
+
+    def is_summary(self):
+        return self.request.query_params.get(self.summary_query_param) in ['1', 'true']
+
+    def get_field_columns(self):
+        if self.is_summary():
+            return self.summary_field_columns
+        return self.field_columns
 
     def get_queryset(self):
-        return models.Order.objects.filter(customer__user_id=self.request.user.pk) \
-            .prefetch_related(
+        queryset = self.get_fieldset_queryset(
+            models.Order.objects.filter(customer_id=self.request.user.customer_pk)
+        )
+        if self.is_summary():
+            # Each page is a single grouped query over the order items.
+            return queryset.annotate(
+                items_count=Coalesce(Sum('items__quantity'), 0),
+                total=Coalesce(
+                    Sum(F('items__quantity') * F('items__price')),
+                    Value(Decimal(0)),
+                    output_field=DecimalField(max_digits=10, decimal_places=2)
+                )
+            )
+        if {'items', 'total'} & self.get_fieldset():
+            queryset = queryset.prefetch_related(
                 Prefetch(
                     'items',
                     queryset=models.OrderItem.objects.select_related('product')
+                    .only('order_id', 'quantity', 'price', 'product__title')
                 )
             )
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return serializers.OrderCreateSerializer
+        if self.is_summary():
+            return serializers.OrderSummarySerializer
         return serializers.OrderSerializer
 
     def create(self, request, *args, **kwargs):
         serializer = serializers.OrderCreateSerializer(
             data=request.data,
-            context={'user_pk': self.request.user.pk}
+            context={'customer_pk': self.request.user.customer_pk}
         )
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
@@ -145,10 +684,62 @@ class OrderDetail(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return models.Order.objects.filter(customer__user_id=self.request.user.pk) \
+        return models.Order.objects.filter(customer_id=self.request.user.customer_pk) \
             .prefetch_related(
                 Prefetch(
                     'items',
                     queryset=models.OrderItem.objects.select_related('product')
                 )
             )
+
+
+class Batch(View):
+    # A plain async view: DRF views are sync, and the sub-requests are
+    # dispatched to them from here.
+    http_method_names = ['post']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def post(self, request):
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        try:
+            # Authenticates once; every sub-request runs as this user.
+            user = await sync_to_async(lambda: drf_request.user)()
+        except APIException as error:
+            data = error.detail if isinstance(error.detail, dict) else {'detail': error.detail}
+            return JsonResponse(data, status=error.status_code)
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'detail': 'Body must be valid JSON.'}, status=400)
+        sub_requests = data.get('requests') if isinstance(data, dict) else None
+        max_requests = settings.BATCH['MAX_REQUESTS']
+        if not isinstance(sub_requests, list) or not 0 < len(sub_requests) <= max_requests:
+            return JsonResponse(
+                {'requests': [f'Pass a list of 1 to {max_requests} requests.']},
+                status=400
+            )
+
+        cleaned_requests = []
+        for index, sub_request in enumerate(sub_requests):
+            try:
+                cleaned_requests.append(batch.clean_sub_request(sub_request))
+            except batch.BatchError as error:
+                return JsonResponse({'requests': {index: [str(error)]}}, status=400)
+
+        results = await batch.execute_batch([
+            batch.build_sub_request(request, user, drf_request.auth, sub_request)
+            for sub_request in cleaned_requests
+        ])
+        return JsonResponse({
+            'responses': [
+                {'id': sub_request['id'], **result}
+                for sub_request, result in zip(cleaned_requests, results)
+            ]
+        })